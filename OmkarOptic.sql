@@ -38,9 +38,13 @@ CREATE TABLE `customers` (
   `Lens` varchar(100) NOT NULL,
   `payment` varchar(50) DEFAULT NULL,
   `remark` varchar(255) NOT NULL,
+  `updated_at` timestamp(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (`id`),
   UNIQUE KEY `bill_no` (`bill_no`),
+  KEY `phone_no` (`phone_no`),
   KEY `Frame` (`Frame`,`Type`),
+  KEY `updated_at` (`updated_at`),
+  KEY `order_date` (`order_date`,`total_amount`),
   CONSTRAINT `customers_ibfk_1` FOREIGN KEY (`Frame`, `Type`) REFERENCES `stocks` (`Frame`, `Type`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -62,11 +66,35 @@ UNLOCK TABLES;
 /*!50003 SET @saved_sql_mode       = @@sql_mode */ ;
 /*!50003 SET sql_mode              = 'ONLY_FULL_GROUP_BY,STRICT_TRANS_TABLES,NO_ZERO_IN_DATE,NO_ZERO_DATE,ERROR_FOR_DIVISION_BY_ZERO,NO_ENGINE_SUBSTITUTION' */ ;
 DELIMITER ;;
-/*!50003 CREATE*/ /*!50017 DEFINER=`root`@`localhost`*/ /*!50003 TRIGGER `update_stock_after_order` AFTER INSERT ON `customers` FOR EACH ROW BEGIN
-    UPDATE Stocks
-    SET Count = Count - 1
-    WHERE Frame = NEW.Frame AND Type = NEW.Type;
-END */;;
+CREATE TRIGGER `sales_rollup_after_insert` AFTER INSERT ON `customers` FOR EACH ROW BEGIN
+    INSERT INTO sales_daily (day, Frame, Type, orders, amount, collected)
+    VALUES (NEW.order_date, NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+    ON DUPLICATE KEY UPDATE orders = orders + 1, amount = amount + NEW.total_amount, collected = collected + NEW.advance_amount;
+    INSERT INTO sales_monthly (month, Frame, Type, orders, amount, collected)
+    VALUES (NEW.order_date - INTERVAL (DAY(NEW.order_date) - 1) DAY, NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+    ON DUPLICATE KEY UPDATE orders = orders + 1, amount = amount + NEW.total_amount, collected = collected + NEW.advance_amount;
+END ;;
+CREATE TRIGGER `sales_rollup_after_update` AFTER UPDATE ON `customers` FOR EACH ROW BEGIN
+    IF NOT (NEW.order_date <=> OLD.order_date AND NEW.Frame <=> OLD.Frame AND NEW.Type <=> OLD.Type
+            AND NEW.total_amount <=> OLD.total_amount AND NEW.advance_amount <=> OLD.advance_amount) THEN
+        UPDATE sales_daily SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+        WHERE day = OLD.order_date AND Frame = OLD.Frame AND Type = OLD.Type;
+        UPDATE sales_monthly SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+        WHERE month = OLD.order_date - INTERVAL (DAY(OLD.order_date) - 1) DAY AND Frame = OLD.Frame AND Type = OLD.Type;
+        INSERT INTO sales_daily (day, Frame, Type, orders, amount, collected)
+        VALUES (NEW.order_date, NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+        ON DUPLICATE KEY UPDATE orders = orders + 1, amount = amount + NEW.total_amount, collected = collected + NEW.advance_amount;
+        INSERT INTO sales_monthly (month, Frame, Type, orders, amount, collected)
+        VALUES (NEW.order_date - INTERVAL (DAY(NEW.order_date) - 1) DAY, NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+        ON DUPLICATE KEY UPDATE orders = orders + 1, amount = amount + NEW.total_amount, collected = collected + NEW.advance_amount;
+    END IF;
+END ;;
+CREATE TRIGGER `sales_rollup_after_delete` AFTER DELETE ON `customers` FOR EACH ROW BEGIN
+    UPDATE sales_daily SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+    WHERE day = OLD.order_date AND Frame = OLD.Frame AND Type = OLD.Type;
+    UPDATE sales_monthly SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+    WHERE month = OLD.order_date - INTERVAL (DAY(OLD.order_date) - 1) DAY AND Frame = OLD.Frame AND Type = OLD.Type;
+END ;;
 DELIMITER ;
 /*!50003 SET sql_mode              = @saved_sql_mode */ ;
 /*!50003 SET character_set_client  = @saved_cs_client */ ;
@@ -105,6 +133,42 @@ LOCK TABLES `eye_prescriptions` WRITE;
 /*!40000 ALTER TABLE `eye_prescriptions` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `sales_daily`
+--
+
+DROP TABLE IF EXISTS `sales_daily`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `sales_daily` (
+  `day` date NOT NULL,
+  `Frame` varchar(50) NOT NULL,
+  `Type` varchar(50) NOT NULL,
+  `orders` int NOT NULL DEFAULT '0',
+  `amount` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `collected` decimal(12,2) NOT NULL DEFAULT '0.00',
+  PRIMARY KEY (`day`,`Frame`,`Type`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `sales_monthly`
+--
+
+DROP TABLE IF EXISTS `sales_monthly`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `sales_monthly` (
+  `month` date NOT NULL,
+  `Frame` varchar(50) NOT NULL,
+  `Type` varchar(50) NOT NULL,
+  `orders` int NOT NULL DEFAULT '0',
+  `amount` decimal(12,2) NOT NULL DEFAULT '0.00',
+  `collected` decimal(12,2) NOT NULL DEFAULT '0.00',
+  PRIMARY KEY (`month`,`Frame`,`Type`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `spectacles_no`
 --
@@ -149,8 +213,10 @@ CREATE TABLE `stocks` (
   `Type` varchar(50) NOT NULL,
   `Count` int NOT NULL,
   `Date` date NOT NULL,
+  `updated_at` timestamp(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
   PRIMARY KEY (`No`),
   UNIQUE KEY `Frame` (`Frame`,`Type`),
+  KEY `updated_at` (`updated_at`),
   CONSTRAINT `stocks_chk_1` CHECK ((`Count` >= 0))
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -190,6 +256,80 @@ LOCK TABLES `users` WRITE;
 INSERT INTO `users` VALUES (1,'Omkar','$2b$12$wcqvXGlGc/EuoskGWKYui.Dgctga/o8jsEFzV/LBznh9iGK8LBZdu','user'),(3,'Omkar@admin','$2b$12$6qmja.pQKEaxmvMIQO1.aOYvcZOnzGRSVUQ6D8C9MjPUbjTiNMiWG','admin');
 /*!40000 ALTER TABLE `users` ENABLE KEYS */;
 UNLOCK TABLES;
+
+--
+-- Dumping routines for database 'users'
+--
+DROP PROCEDURE IF EXISTS `place_order`;
+DELIMITER ;;
+CREATE PROCEDURE `place_order`(
+    IN p_name varchar(100), IN p_phone_no varchar(15), IN p_bill_no varchar(50), IN p_order_date date, IN p_dob date,
+    IN p_frame varchar(50), IN p_type varchar(50), IN p_total decimal(10,2), IN p_discount decimal(10,2),
+    IN p_advance decimal(10,2), IN p_balance decimal(10,2), IN p_lens varchar(100), IN p_payment varchar(50),
+    IN p_remark varchar(255), IN p_unique_no varchar(50),
+    IN d_re_sph decimal(5,2), IN d_re_cyl decimal(5,2), IN d_re_axis int,
+    IN d_le_sph decimal(5,2), IN d_le_cyl decimal(5,2), IN d_le_axis int,
+    IN r_re_sph decimal(5,2), IN r_re_cyl decimal(5,2), IN r_re_axis int,
+    IN r_le_sph decimal(5,2), IN r_le_cyl decimal(5,2), IN r_le_axis int,
+    IN p_claimed boolean)
+BEGIN
+    -- Claims one unit of stock, saves the whole order and returns (customer id, stock left for
+    -- the Frame/Type). The claim is its own short statement, committed by START TRANSACTION,
+    -- so the stocks row is not locked while the order rows are written; a failed order gives it back.
+    -- p_claimed: the caller already claimed the unit with reserve_stock and gives it back itself.
+    -- A bill already saved with the same spectacles number was sent before (the reply was lost)
+    -- and is only looked up; with another spectacles number it is rejected.
+    DECLARE v_customer_id int;
+    DECLARE v_unique_no varchar(50);
+    DECLARE v_message varchar(255);
+    DECLARE v_reserved boolean DEFAULT FALSE;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        IF v_reserved THEN
+            -- Connections run with autocommit off, so the give-back needs its own COMMIT or the
+            -- caller's rollback would undo it
+            UPDATE stocks SET Count = Count + 1 WHERE Frame = p_frame AND Type = p_type;
+            COMMIT;
+        END IF;
+        RESIGNAL;
+    END;
+
+    SET v_customer_id = (SELECT id FROM customers WHERE bill_no = p_bill_no);
+    IF v_customer_id IS NOT NULL THEN
+        SET v_unique_no = (SELECT unique_no FROM spectacles_no WHERE customer_id = v_customer_id LIMIT 1);
+        IF NOT (v_unique_no <=> p_unique_no) THEN
+            SET v_message = CONCAT('Bill number ', p_bill_no, ' is already used by another order.');
+            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = v_message;
+        END IF;
+    ELSE
+        IF NOT p_claimed THEN
+            UPDATE stocks SET Count = Count - 1 WHERE Frame = p_frame AND Type = p_type AND Count > 0;
+            IF ROW_COUNT() = 0 THEN
+                SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Out of stock';
+            END IF;
+            SET v_reserved = TRUE;
+        END IF;
+
+        START TRANSACTION;
+        INSERT INTO customers
+            (name, phone_no, bill_no, order_date, dob, Frame, Type, total_amount, discount, advance_amount, balance_amount, Lens, payment, remark)
+        VALUES (p_name, p_phone_no, p_bill_no, p_order_date, p_dob, p_frame, p_type, p_total, p_discount, p_advance, p_balance, p_lens, p_payment, p_remark);
+        SET v_customer_id = LAST_INSERT_ID();
+
+        INSERT INTO eye_prescriptions (customer_id, eye_type, re_sph, re_cyl, re_axis, le_sph, le_cyl, le_axis)
+        VALUES (v_customer_id, 'Distance', d_re_sph, d_re_cyl, d_re_axis, d_le_sph, d_le_cyl, d_le_axis),
+               (v_customer_id, 'Reading', r_re_sph, r_re_cyl, r_re_axis, r_le_sph, r_le_cyl, r_le_axis);
+
+        INSERT INTO spectacles_no (customer_id, Frame, Type, unique_no)
+        VALUES (v_customer_id, p_frame, p_type, p_unique_no);
+        COMMIT;
+    END IF;
+
+    SELECT v_customer_id, Count FROM stocks WHERE Frame = p_frame AND Type = p_type;
+END ;;
+DELIMITER ;
+
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -0,0 +1,138 @@
+-- Embedded (SQLite) equivalent of OmkarOptic.sql for single-counter shops, applied by
+-- sqlite_backend.py the first time it opens an empty database file (PRAGMA user_version = 0).
+-- Text columns the MySQL schema compares case-insensitively (utf8mb4_0900_ai_ci) are COLLATE NOCASE.
+-- place_order is not a stored procedure here; sqlite_backend.py runs the same steps for CALL place_order(...).
+
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE stocks (
+  No integer PRIMARY KEY AUTOINCREMENT,
+  Frame varchar(50) NOT NULL COLLATE NOCASE,
+  Type varchar(50) NOT NULL COLLATE NOCASE,
+  Count int NOT NULL CHECK (Count >= 0),
+  Date date NOT NULL,
+  updated_at timestamp NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+  UNIQUE (Frame, Type)
+);
+CREATE INDEX stocks_updated_at ON stocks (updated_at);
+
+CREATE TABLE customers (
+  id integer PRIMARY KEY AUTOINCREMENT,
+  name varchar(100) NOT NULL,
+  phone_no varchar(15) NOT NULL COLLATE NOCASE,
+  bill_no varchar(50) NOT NULL COLLATE NOCASE UNIQUE,
+  order_date date NOT NULL,
+  dob date NOT NULL,
+  Frame varchar(50) NOT NULL COLLATE NOCASE,
+  Type varchar(50) NOT NULL COLLATE NOCASE,
+  total_amount decimal(10,2) NOT NULL,
+  discount decimal(10,2) NOT NULL,
+  advance_amount decimal(10,2) NOT NULL,
+  balance_amount decimal(10,2) NOT NULL,
+  Lens varchar(100) NOT NULL,
+  payment varchar(50) DEFAULT NULL,
+  remark varchar(255) NOT NULL,
+  updated_at timestamp NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+  FOREIGN KEY (Frame, Type) REFERENCES stocks (Frame, Type) ON DELETE CASCADE
+);
+CREATE INDEX customers_phone_no ON customers (phone_no);
+CREATE INDEX customers_frame ON customers (Frame, Type);
+CREATE INDEX customers_updated_at ON customers (updated_at);
+CREATE INDEX customers_order_date ON customers (order_date, total_amount);
+
+CREATE TABLE eye_prescriptions (
+  id integer PRIMARY KEY AUTOINCREMENT,
+  customer_id int NOT NULL REFERENCES customers (id) ON DELETE CASCADE,
+  eye_type varchar(8) NOT NULL CHECK (eye_type IN ('Distance', 'Reading')),
+  re_sph decimal(5,2) DEFAULT NULL,
+  re_cyl decimal(5,2) DEFAULT NULL,
+  re_axis int DEFAULT NULL,
+  le_sph decimal(5,2) DEFAULT NULL,
+  le_cyl decimal(5,2) DEFAULT NULL,
+  le_axis int DEFAULT NULL
+);
+CREATE INDEX eye_prescriptions_customer_id ON eye_prescriptions (customer_id);
+
+CREATE TABLE spectacles_no (
+  id integer PRIMARY KEY AUTOINCREMENT,
+  customer_id int NOT NULL REFERENCES customers (id) ON DELETE CASCADE,
+  Frame varchar(50) NOT NULL COLLATE NOCASE,
+  Type varchar(50) NOT NULL COLLATE NOCASE,
+  unique_no varchar(50) NOT NULL COLLATE NOCASE UNIQUE,
+  FOREIGN KEY (Frame, Type) REFERENCES stocks (Frame, Type) ON DELETE CASCADE
+);
+CREATE INDEX spectacles_no_customer_id ON spectacles_no (customer_id);
+CREATE INDEX spectacles_no_frame ON spectacles_no (Frame, Type);
+
+CREATE TABLE sales_daily (
+  day date NOT NULL,
+  Frame varchar(50) NOT NULL COLLATE NOCASE,
+  Type varchar(50) NOT NULL COLLATE NOCASE,
+  orders int NOT NULL DEFAULT 0,
+  amount decimal(12,2) NOT NULL DEFAULT 0,
+  collected decimal(12,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, Frame, Type)
+);
+
+CREATE TABLE sales_monthly (
+  month date NOT NULL,
+  Frame varchar(50) NOT NULL COLLATE NOCASE,
+  Type varchar(50) NOT NULL COLLATE NOCASE,
+  orders int NOT NULL DEFAULT 0,
+  amount decimal(12,2) NOT NULL DEFAULT 0,
+  collected decimal(12,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (month, Frame, Type)
+);
+
+CREATE TABLE users (
+  id integer PRIMARY KEY AUTOINCREMENT,
+  username varchar(50) NOT NULL COLLATE NOCASE UNIQUE,
+  password varchar(255) NOT NULL,
+  type varchar(20) DEFAULT NULL
+);
+INSERT INTO users VALUES (1,'Omkar','$2b$12$wcqvXGlGc/EuoskGWKYui.Dgctga/o8jsEFzV/LBznh9iGK8LBZdu','user'),(3,'Omkar@admin','$2b$12$6qmja.pQKEaxmvMIQO1.aOYvcZOnzGRSVUQ6D8C9MjPUbjTiNMiWG','admin');
+
+-- ON UPDATE CURRENT_TIMESTAMP: the inner UPDATE changes updated_at, so the WHEN clauses keep
+-- it from firing a second time
+CREATE TRIGGER stocks_touch AFTER UPDATE ON stocks FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE stocks SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') WHERE No = NEW.No;
+END;
+CREATE TRIGGER customers_touch AFTER UPDATE ON customers FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE customers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER sales_rollup_after_insert AFTER INSERT ON customers FOR EACH ROW
+BEGIN
+    INSERT INTO sales_daily (day, Frame, Type, orders, amount, collected)
+    VALUES (NEW.order_date, NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+    ON CONFLICT (day, Frame, Type) DO UPDATE SET orders = orders + 1, amount = amount + excluded.amount, collected = collected + excluded.collected;
+    INSERT INTO sales_monthly (month, Frame, Type, orders, amount, collected)
+    VALUES (date(NEW.order_date, 'start of month'), NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+    ON CONFLICT (month, Frame, Type) DO UPDATE SET orders = orders + 1, amount = amount + excluded.amount, collected = collected + excluded.collected;
+END;
+CREATE TRIGGER sales_rollup_after_update AFTER UPDATE ON customers FOR EACH ROW
+WHEN NOT (NEW.order_date IS OLD.order_date AND NEW.Frame IS OLD.Frame AND NEW.Type IS OLD.Type
+          AND NEW.total_amount IS OLD.total_amount AND NEW.advance_amount IS OLD.advance_amount)
+BEGIN
+    UPDATE sales_daily SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+    WHERE day = OLD.order_date AND Frame = OLD.Frame AND Type = OLD.Type;
+    UPDATE sales_monthly SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+    WHERE month = date(OLD.order_date, 'start of month') AND Frame = OLD.Frame AND Type = OLD.Type;
+    INSERT INTO sales_daily (day, Frame, Type, orders, amount, collected)
+    VALUES (NEW.order_date, NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+    ON CONFLICT (day, Frame, Type) DO UPDATE SET orders = orders + 1, amount = amount + excluded.amount, collected = collected + excluded.collected;
+    INSERT INTO sales_monthly (month, Frame, Type, orders, amount, collected)
+    VALUES (date(NEW.order_date, 'start of month'), NEW.Frame, NEW.Type, 1, NEW.total_amount, NEW.advance_amount)
+    ON CONFLICT (month, Frame, Type) DO UPDATE SET orders = orders + 1, amount = amount + excluded.amount, collected = collected + excluded.collected;
+END;
+CREATE TRIGGER sales_rollup_after_delete AFTER DELETE ON customers FOR EACH ROW
+BEGIN
+    UPDATE sales_daily SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+    WHERE day = OLD.order_date AND Frame = OLD.Frame AND Type = OLD.Type;
+    UPDATE sales_monthly SET orders = orders - 1, amount = amount - OLD.total_amount, collected = collected - OLD.advance_amount
+    WHERE month = date(OLD.order_date, 'start of month') AND Frame = OLD.Frame AND Type = OLD.Type;
+END;
+
+PRAGMA user_version = 3;
@@ -1,15 +1,30 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from mysql.connector import IntegrityError, Error
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-from db_config import get_connection
+from db_worker import QueryExecutor
+from virtual_table import KeysetQuery, VirtualTable
+from repository import repo, StockRow
+from report_cache import ReportCache
+from stock_import import import_stock
+from data_export import export_data, EXPORT_FORMATS
+from instrumentation import metrics, SLOW_LOG_PATH, METRICS_PATH
+from change_feed import BroadcastClient
+from db_config import get_connection, IntegrityError, Error, CHANGE_FEED_CONFIG
 import gc
-import matplotlib.pyplot as plt
-from collections import defaultdict
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from charts import ChartWindow
 from dateutil.relativedelta import relativedelta
+from tkcalendar import DateEntry
 
 current_date = datetime.today().strftime('%Y-%m-%d')
+DEFAULT_SALES_MONTHS = 7
+
+STOCK_QUERY = KeysetQuery(
+    "SELECT No, Frame, Type, Count, Date FROM Stocks",
+    key=[("No", 0)],
+    sortable={"No": ("No", 0), "Frame": ("Frame", 1), "Type": ("Type", 2), "Count": ("Count", 3), "Date": ("Date", 4)},
+    name="stock_page",
+    record=StockRow,
+)
 
 class AdminDashboard:
     def __init__(self, master):
@@ -24,15 +39,42 @@ class AdminDashboard:
         style.configure("TButton", font=("Arial", 12), padding=5)
         style.configure("TEntry", font=("Arial", 12))
 
+        self.db = QueryExecutor(self.master, on_busy=self.set_busy)
+        self.reports = ReportCache()
+        self.stock_edits = {}       # No -> (row, new count) changed in batch edit mode, not yet saved
+        self.count_editor = None    # (entry widget, item id) while a Count cell is being edited
+        # Stock edits are announced so open counters refresh their frame lists straight away
+        self.broadcast = BroadcastClient().start() if CHANGE_FEED_CONFIG['enabled'] else None
+        self.charts = {
+            "daily": ChartWindow(self.master, self.db, "Daily Sales"),
+            "monthly": ChartWindow(self.master, self.db, "Monthly Sales", color='green'),
+        }
+        self.status_label = ttk.Label(self.master, text="", font=("Arial", 10), foreground="gray")
+        self.status_label.pack(side="bottom", anchor="w", padx=10)
+
         self.create_widgets()
         self.fetch_data()
         ttk.Button(self.master, text="Back to Login", command=self.back_to_login).pack(pady=10)
 
     def close_app(self):
+        self.db.shutdown()
+        if self.broadcast:
+            self.broadcast.stop()
         self.master.destroy()
         gc.collect()
 
+    def announce_stock(self):
+        if self.broadcast:
+            self.broadcast.publish("stocks")
+
+    def set_busy(self, busy):
+        self.master.config(cursor="watch" if busy else "")
+        self.status_label.config(text="Working..." if busy else "")
+
     def back_to_login(self):
+        self.db.shutdown()
+        if self.broadcast:
+            self.broadcast.stop()
         self.master.destroy()
         gc.collect()
         import login 
@@ -57,6 +99,7 @@ class AdminDashboard:
         self.entry_date_add.grid(row=3, column=1, padx=5, pady=5)
 
         ttk.Button(self.frame_add, text="Add Stock", command=self.add_stock).grid(row=4, column=0, columnspan=2, pady=10)
+        ttk.Button(self.frame_add, text="Import CSV", command=self.import_stock_csv).grid(row=4, column=2, pady=10)
         self.tree = self._create_treeview(self.frame_add, 5)
 
         # Update Stock Tab
@@ -74,13 +117,26 @@ class AdminDashboard:
         self.entry_date_update.grid(row=3, column=1, padx=5, pady=5)
 
         ttk.Button(self.frame_update, text="Update Stock", command=self.update_stock).grid(row=4, column=0, columnspan=2, pady=10)
+        self.batch_mode = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.frame_update, text="Batch edit counts (double-click Count)",
+                        variable=self.batch_mode).grid(row=4, column=2, pady=10)
         self.tree2 = self._create_treeview(self.frame_update, 5, bind_select=True)
+        self.tree2.tree.bind("<Double-1>", self.edit_count)
+        self.tree2.tree.tag_configure("edited", background="#fff3c4")
+        batch = ttk.Frame(self.frame_update)
+        batch.grid(row=6, column=0, columnspan=3, sticky="w")
+        self.save_edits_button = ttk.Button(batch, text="Save Changes", command=self.save_stock_edits)
+        self.save_edits_button.pack(side="left", padx=5)
+        ttk.Button(batch, text="Discard Changes", command=self.discard_stock_edits).pack(side="left", padx=5)
+        self.stock_edits_label = ttk.Label(batch, text="")
+        self.stock_edits_label.pack(side="left", padx=5)
 
         # Daily Sales Tab
         self.frame_daily_sales = ttk.Frame(notebook, padding=10)
         notebook.add(self.frame_daily_sales, text="Daily Sales")
 
         ttk.Label(self.frame_daily_sales, text="Generate Daily Sales Report", font=("Arial", 14)).pack(pady=10)
+        self.daily_range = self._create_date_range(self.frame_daily_sales)
         ttk.Button(self.frame_daily_sales, text="Generate Report", command=self.generate_daily_sales).pack(pady=10)
 
         # Monthly Sales Tab
@@ -88,92 +144,115 @@ class AdminDashboard:
         notebook.add(self.frame_monthly_sales, text="Monthly Sales")
 
         ttk.Label(self.frame_monthly_sales, text="Generate Monthly Sales Report", font=("Arial", 14)).pack(pady=10)
+        self.monthly_range = self._create_date_range(self.frame_monthly_sales)
         ttk.Button(self.frame_monthly_sales, text="Generate Report", command=self.generate_monthly_sales).pack(pady=10)
 
+        # Export Tab
+        self.frame_export = ttk.Frame(notebook, padding=10)
+        notebook.add(self.frame_export, text="Export")
+
+        ttk.Label(self.frame_export, text="Export Customers and Prescriptions", font=("Arial", 14)).pack(pady=10)
+        self.export_range = self._create_date_range(self.frame_export)
+        self.export_all_dates = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.frame_export, text="All dates", variable=self.export_all_dates).pack(pady=5)
+        self.export_format = ttk.Combobox(self.frame_export, values=EXPORT_FORMATS, state="readonly", width=10)
+        self.export_format.set(EXPORT_FORMATS[0])
+        self.export_format.pack(pady=5)
+        ttk.Button(self.frame_export, text="Export", command=self.export_records).pack(pady=10)
+
+        # Diagnostics Tab
+        self.frame_diagnostics = ttk.Frame(notebook, padding=10)
+        notebook.add(self.frame_diagnostics, text="Diagnostics")
+        self._create_diagnostics(self.frame_diagnostics)
+
+    def _create_date_range(self, parent):
+        frame = ttk.Frame(parent)
+        frame.pack(pady=5)
+        today = datetime.today().date()
+        entries = []
+        for col, (text, initial) in enumerate([("From:", today - relativedelta(months=DEFAULT_SALES_MONTHS)), ("To:", today)]):
+            ttk.Label(frame, text=text).grid(row=0, column=col * 2, padx=5)
+            entry = DateEntry(frame, width=12, date_pattern="yyyy-mm-dd")
+            entry.set_date(initial)
+            entry.grid(row=0, column=col * 2 + 1, padx=5)
+            entries.append(entry)
+        return tuple(entries)
+
+    @metrics.timed("ui:generate_daily_sales")
     def generate_daily_sales(self):
-        daily_sales, _ = self.fetch_sales_data()
+        self.fetch_sales_data("daily", self.daily_range, self._plot_daily_sales)
+
+    def _plot_daily_sales(self, daily_sales):
         if not daily_sales:
             messagebox.showinfo("Info", "No daily sales data found.")
             return
 
-        fig, ax = plt.subplots(figsize=(6, 4))
-        keys = sorted(daily_sales.keys())
-        values = [daily_sales[k] for k in keys]
-        ax.bar(keys, values)
-        ax.set_title("Daily Sales")
-        ax.set_ylabel("Amount")
-        ax.tick_params(axis='x', rotation=45)
-
-        self._show_chart(fig)
+        self.charts["daily"].show(daily_sales)
 
+    @metrics.timed("ui:generate_monthly_sales")
     def generate_monthly_sales(self):
-        _, monthly_sales = self.fetch_sales_data()
+        self.fetch_sales_data("monthly", self.monthly_range, self._plot_monthly_sales)
+
+    def _plot_monthly_sales(self, monthly_sales):
         if not monthly_sales:
             messagebox.showinfo("Info", "No monthly sales data found.")
             return
 
-        fig, ax = plt.subplots(figsize=(6, 4))
-        keys = sorted(monthly_sales.keys())
-        values = [monthly_sales[k] for k in keys]
-        ax.bar(keys, values, color='green')
-        ax.set_title("Monthly Sales")
-        ax.set_ylabel("Amount")
-        ax.tick_params(axis='x', rotation=45)
-
-        self._show_chart(fig)
-
-    def _show_chart(self, fig):
-        top = tk.Toplevel(self.master)
-        top.title("Sales Chart")
-        canvas = FigureCanvasTkAgg(fig, master=top)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-
-        def on_close():
-            plt.close(fig)
-            top.destroy()
-            gc.collect()
+        self.charts["monthly"].show(monthly_sales)
 
-        top.protocol("WM_DELETE_WINDOW", on_close)
-
-    def fetch_sales_data(self):
-        conn = None
-        cursor = None
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT order_date, total_amount FROM customers")
-            data = cursor.fetchall()
-        except Error as e:
-            messagebox.showerror("Database Error", str(e))
-            return {}, {}
-        finally:
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
-
-        del conn,cursor
-
-        daily_sales = defaultdict(int)
-        monthly_sales = defaultdict(int)
-
-        today = datetime.today().date()
-        seven_months_ago = (datetime.today() - relativedelta(months=7)).date()
-
-        for date_obj, amount in data:
-            try:
-                if isinstance(date_obj, str):
-                    date_obj = datetime.strptime(date_obj, "%Y-%m-%d").date()
-                elif isinstance(date_obj, datetime):
-                    date_obj = date_obj.date()
-                if seven_months_ago <= date_obj <= today:
-                    daily_sales[date_obj.strftime("%Y-%m-%d")] += amount
-                    monthly_sales[date_obj.strftime("%Y-%m")] += amount
-            except Exception as e:
-                print(f"Date format error: {e} for value {date_obj}")
-
-        return daily_sales, monthly_sales
+    def fetch_sales_data(self, kind, date_range, callback):
+        start, end = (entry.get_date() for entry in date_range)
+        if start > end:
+            messagebox.showerror("Input Error", "The From date must not be after the To date.")
+            return
+        # A repeated click on the same report supersedes the pending one
+        self.db.submit(self.reports.get, kind, start, end, callback=callback,
+                       errback=lambda e: messagebox.showerror("Database Error", str(e)), key=f"{kind}_sales")
+
+    def _create_diagnostics(self, parent):
+        columns = ("Name", "Calls", "Errors", "Avg ms", "P95 ms", "Max ms", "Rows")
+        self.diag_trees = {}
+        for section, title in (("queries", "Database statements"), ("ui", "Screen actions and background jobs")):
+            ttk.Label(parent, text=title, font=("Arial", 12, "bold")).pack(anchor="w")
+            tree = ttk.Treeview(parent, columns=columns, show="headings", height=6)
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=220 if col == "Name" else 70, anchor="w" if col == "Name" else "e")
+            tree.pack(fill="both", expand=True, pady=(0, 5))
+            self.diag_trees[section] = tree
+        self.diag_pool = ttk.Label(parent, text="")
+        self.diag_pool.pack(anchor="w")
+        ttk.Label(parent, text=f"Slow statements: {SLOW_LOG_PATH}\nMetrics file: {METRICS_PATH}",
+                  font=("Arial", 9), foreground="gray").pack(anchor="w", pady=5)
+        buttons = ttk.Frame(parent)
+        buttons.pack(anchor="w")
+        ttk.Button(buttons, text="Refresh", command=self.refresh_diagnostics).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Save Now", command=lambda: metrics.dump()).pack(side="left", padx=5)
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        snapshot = metrics.snapshot()
+        for section, tree in self.diag_trees.items():
+            tree.delete(*tree.get_children())
+            # Slowest overall first: that is where time goes
+            for name, h in sorted(snapshot[section].items(), key=lambda item: -item[1]['total_ms']):
+                tree.insert("", "end", values=(name, h['calls'], h['errors'], h['avg_ms'], h['p95_ms'], h['max_ms'], h['rows']))
+        pool = snapshot['pool']
+        self.diag_pool.config(text="Connection pool: " + ", ".join(f"{k} {v}" for k, v in pool.items()))
+
+    def export_records(self):
+        start, end = (None, None) if self.export_all_dates.get() else (entry.get_date() for entry in self.export_range)
+        if start and start > end:
+            messagebox.showerror("Input Error", "The From date must not be after the To date.")
+            return
+        out_dir = filedialog.askdirectory(title="Export to folder")
+        if not out_dir:
+            return
+        # An interrupted export to the same folder with the same options continues where it stopped
+        self.db.submit(export_data, out_dir, self.export_format.get(), start, end, key="export",
+                       callback=lambda counts: messagebox.showinfo(
+                           "Export Complete", "\n".join(f"{name}: {rows} rows" for name, rows in counts.items())),
+                       errback=lambda e: messagebox.showerror("Export Error", str(e)))
 
     def _create_labeled_entry(self, parent, text, row):
         ttk.Label(parent, text=text).grid(row=row, column=0, sticky='w', padx=5, pady=5)
@@ -183,46 +262,21 @@ class AdminDashboard:
 
     def _create_treeview(self, parent, row, bind_select=False):
         columns = ("No", "Frame", "Type", "Count", "Date")
-        tree = ttk.Treeview(parent, columns=columns, show="headings", height=5)
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=100)
-        tree.grid(row=row, column=0, columnspan=2, padx=5, pady=10, sticky="nsew")
-
-        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
-        scrollbar.grid(row=row, column=2, sticky="ns")
+        tree = VirtualTable(parent, columns, query=STOCK_QUERY, executor=self.db, height=5,
+                            on_error=lambda e: messagebox.showerror("Database Error", str(e)))
+        tree.grid(row=row, column=0, columnspan=3, padx=5, pady=10, sticky="nsew")
 
         parent.grid_columnconfigure(1, weight=1)
         parent.grid_rowconfigure(row, weight=1)
 
         if bind_select:
-            tree.bind("<<TreeviewSelect>>", self.on_row_selected)
+            tree.tree.bind("<<TreeviewSelect>>", self.on_row_selected)
 
         return tree
 
     def fetch_data(self):
-        conn = None
-        cursor = None
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM Stocks")
-            rows = cursor.fetchall()
-        except Error as e:
-            messagebox.showerror("Database Error", str(e))
-            return
-        finally:
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
-
         for trv in [self.tree, self.tree2]:
-            trv.delete(*trv.get_children())
-            for row in rows:
-                trv.insert("", "end", values=row)
-        del conn,cursor
+            trv.reload()
 
     def add_stock(self):
         frame = self.entry_frame_add.get()
@@ -234,26 +288,42 @@ class AdminDashboard:
             messagebox.showerror("Input Error", "Please enter valid Frame, Type, and numeric Count.")
             return
 
-        conn = None
-        cursor = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO Stocks (Frame, Type, Count, Date) VALUES (%s, %s, %s, %s)",
-                           (frame, type_, int(count), date))
-            conn.commit()
-            messagebox.showinfo("Success", "Stock added successfully.")
-            self.fetch_data()
+            _, stock_id = repo.execute("add_stock", (frame, type_, int(count), date))
+            self.announce_stock()
+            self.patch_stock_row(StockRow(stock_id, frame, type_, int(count), datetime.today().date()))
+            self.status_label.config(text="Stock added successfully.")
         except IntegrityError:
             messagebox.showerror("Duplicate Error", "Frame & Type combination already exists.")
         except Error as e:
             messagebox.showerror("Database Error", str(e))
-        finally:
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
-        del cursor,conn
+
+    def import_stock_csv(self):
+        path = filedialog.askopenfilename(title="Import stock (Frame, Type, Count)",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        self.db.submit(import_stock, path, callback=self._stock_imported, key="import_stock",
+                       errback=lambda e: messagebox.showerror("Import Error", str(e)))
+
+    def _stock_imported(self, result):
+        # One reload for the whole file instead of one per row
+        self.fetch_data()
+        if result.imported:
+            self.announce_stock()
+        if not result.errors:
+            messagebox.showinfo("Import Complete", result.summary())
+            return
+        top = tk.Toplevel(self.master)
+        top.title("Import Complete")
+        ttk.Label(top, text=result.summary()).pack(anchor="w", padx=10, pady=5)
+        text = tk.Text(top, width=80, height=15, font=("Arial", 10))
+        scroll = ttk.Scrollbar(top, orient="vertical", command=text.yview)
+        text.configure(yscrollcommand=scroll.set)
+        scroll.pack(side="right", fill="y")
+        text.pack(fill="both", expand=True, padx=10, pady=5)
+        text.insert("1.0", "\n".join(f"Line {line_no}: {message}" for line_no, message in result.errors))
+        text.config(state="disabled")
 
     def update_stock(self):
         selected_item = self.tree2.selection()
@@ -270,27 +340,150 @@ class AdminDashboard:
             messagebox.showerror("Input Error", "Please enter valid Frame, Type, and numeric Count.")
             return
 
-        item_values = self.tree2.item(selected_item)["values"]
-        stock_id = item_values[0]
+        row = self.tree2.row(selected_item[0])
+        stock_id = row.no
 
-        conn = None
-        cursor = None
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE Stocks SET Frame=%s, Type=%s, Count=%s, Date=%s WHERE No=%s",
-                           (frame, type_, int(count), date, stock_id))
-            conn.commit()
-            messagebox.showinfo("Success", "Stock updated successfully.")
-            self.fetch_data()
+            if repo.execute("update_stock", (frame, type_, int(count), date, stock_id, row.count))[0] == 0:
+                # No row matched: sold at a counter or edited elsewhere since the list was loaded
+                # (MySQL also reports 0 when the values were already stored)
+                current = repo.query_one("stock_row", (stock_id,))
+                if current != StockRow(stock_id, frame, type_, int(count), current and current.date):
+                    self.show_stock_conflicts([(stock_id, current)])
+                    return
+            self.announce_stock()
+            self.patch_stock_row(StockRow(stock_id, frame, type_, int(count), datetime.today().date()))
+            self.status_label.config(text="Stock updated successfully.")
         except Error as e:
             messagebox.showerror("Database Error", str(e))
-        finally:
-            if cursor:
-                cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
-        del conn,cursor
+
+    def patch_stock_row(self, row):
+        # Only the written row changes on screen; both tables keep their loaded pages and scroll position
+        for trv in (self.tree, self.tree2):
+            trv.upsert(row)
+
+    def show_stock_conflicts(self, conflicts):
+        # conflicts: [(No, current row or None when deleted)] for writes that matched no row
+        for no, current in conflicts:
+            if current is None:
+                for trv in (self.tree, self.tree2):
+                    trv.remove(str(no))
+            else:
+                self.patch_stock_row(current)
+        messagebox.showwarning("Stock Changed", f"{len(conflicts)} stock row(s) changed since the list was loaded, "
+                                                "e.g. frames sold at the counters, and were not saved. "
+                                                "The current counts are shown; enter the change again.")
+
+    def edit_count(self, event):
+        # Batch edit mode: an entry over the Count cell; changes are kept until Save Changes
+        tree = self.tree2.tree
+        if not self.batch_mode.get() or tree.identify_region(event.x, event.y) != "cell":
+            return
+        iid = tree.identify_row(event.y)
+        bbox = tree.bbox(iid, "Count") if iid else None
+        if not bbox:
+            return
+        self.close_count_editor(save=True)
+        x, y, width, height = bbox
+        editor = ttk.Entry(tree)
+        editor.insert(0, tree.set(iid, "Count"))
+        editor.select_range(0, tk.END)
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_set()
+        editor.bind("<Return>", lambda e: self.close_count_editor(save=True))
+        editor.bind("<FocusOut>", lambda e: self.close_count_editor(save=True))
+        editor.bind("<Escape>", lambda e: self.close_count_editor(save=False))
+        self.count_editor = (editor, iid)
+
+    def close_count_editor(self, save):
+        if self.count_editor is None:
+            return
+        (editor, iid), self.count_editor = self.count_editor, None
+        value = editor.get().strip()
+        editor.destroy()
+        row = self.tree2.row(iid)
+        if not save or row is None:
+            return
+        if not value.isdigit():
+            messagebox.showerror("Input Error", "Count must be a whole number.")
+            return
+        count = int(value)
+        if count == row.count:
+            self.stock_edits.pop(row.no, None)
+            self.tree2.tree.item(iid, tags=())
+        else:
+            self.stock_edits[row.no] = (row, count)
+            self.tree2.tree.item(iid, tags=("edited",))
+        self.tree2.tree.set(iid, "Count", count)
+        self._show_stock_edits()
+
+    def _show_stock_edits(self):
+        self.stock_edits_label.config(text=f"{len(self.stock_edits)} unsaved changes" if self.stock_edits else "")
+
+    def save_stock_edits(self):
+        self.close_count_editor(save=True)
+        if not self.stock_edits:
+            messagebox.showinfo("Info", "No stock changes to save.")
+            return
+        edits = dict(self.stock_edits)
+        today = datetime.today().date()
+        # One save at a time, so every committed save reaches _stock_edits_saved
+        self.save_edits_button.config(state="disabled")
+        self.db.submit(self._write_stock_counts, edits, today,
+                       callback=lambda conflicts: self._stock_edits_saved(edits, today, conflicts),
+                       errback=self._stock_edits_failed)
+
+    @staticmethod
+    def _write_stock_counts(edits, today):
+        # One transaction. Each count is written only while the row still holds the count the
+        # edit started from; rows changed meanwhile are returned with their current values.
+        conflicts = []
+        with get_connection() as conn:
+            conn.start_transaction()
+            for no, (row, count) in edits.items():
+                if repo.execute("set_stock_count", (count, today, no, row.count), conn)[0] == 0:
+                    conflicts.append((no, repo.query_one("stock_row", (no,), conn)))
+            conn.commit()
+        return conflicts
+
+    def _stock_edits_failed(self, e):
+        self.save_edits_button.config(state="normal")
+        messagebox.showerror("Database Error", f"No changes were saved: {e}")
+
+    def _stock_edits_saved(self, edits, today, conflicts):
+        self.save_edits_button.config(state="normal")
+        stale = dict(conflicts)
+        for no, (row, count) in edits.items():
+            if no in stale:
+                self.stock_edits.pop(no, None)
+                if self.tree2.tree.exists(str(no)):
+                    self.tree2.tree.item(str(no), tags=())
+                continue
+            saved = StockRow(row.no, row.frame, row.type, count, today)
+            self.patch_stock_row(saved)
+            pending = self.stock_edits.pop(no, None)
+            if pending is not None and pending != (row, count) and pending[1] != count:
+                # Edited again while saving: the newer count stays on screen and pending, now
+                # based on the saved row so it is checked against (and discarded back to) that
+                self.stock_edits[no] = (saved, pending[1])
+                if self.tree2.tree.exists(str(no)):
+                    self.tree2.tree.set(str(no), "Count", pending[1])
+            elif self.tree2.tree.exists(str(no)):
+                self.tree2.tree.item(str(no), tags=())
+        self.announce_stock()
+        self._show_stock_edits()
+        self.status_label.config(text=f"{len(edits) - len(conflicts)} stock counts saved.")
+        if conflicts:
+            self.show_stock_conflicts(conflicts)
+
+    def discard_stock_edits(self):
+        self.close_count_editor(save=False)
+        for no, (row, _) in self.stock_edits.items():
+            if self.tree2.tree.exists(str(no)):
+                self.tree2.tree.set(str(no), "Count", row.count)
+                self.tree2.tree.item(str(no), tags=())
+        self.stock_edits.clear()
+        self._show_stock_edits()
 
     def on_row_selected(self, event):
         selected_item = self.tree2.selection()
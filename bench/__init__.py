@@ -0,0 +1,13 @@
+from db_config import pool
+
+# Benchmarks run against their own database so synthetic rows never reach the shop's data.
+# Create it once from the normal schema:
+#   mysql -u root -p --port=3360 -e "CREATE DATABASE users_bench"
+#   mysql -u root -p --port=3360 users_bench < OmkarOptic.sql
+BENCH_DATABASE = "users_bench"
+
+
+def use_database(name=BENCH_DATABASE):
+    # Must run before anything checks out a connection
+    pool.close_all()
+    pool.config = dict(pool.config, database=name)
@@ -0,0 +1,125 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from bench import BENCH_DATABASE, use_database
+
+# python -m bench generate --customers 100000
+# python -m bench run --report bench_report.json [--baseline previous.json]
+
+REGRESSION_TOLERANCE = 0.25     # median slower than the baseline by more than this fails the run
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def time_case(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'iterations': iterations,
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+        'max_ms': round(max(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def run(args):
+    from bench.cases import CASES
+    from bench.synthetic import table_sizes
+    from db_config import pool_stats
+    from repository import repo
+
+    selected = [(name, setup) for name, setup in CASES if not args.only or name in args.only]
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec="seconds"),
+            'database': args.database,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'table_rows': table_sizes(),
+        },
+        'cases': {},
+        'errors': {},
+    }
+    for name, setup in selected:
+        try:
+            report['cases'][name] = time_case(setup(), args.iterations, args.warmup)
+        except Exception as e:
+            report['errors'][name] = str(e)
+        print(f"{name:32} {report['cases'].get(name, {}).get('median_ms', 'error')}")
+    report['statements'] = repo.stats()
+    report['pool'] = pool_stats()
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Report written to {args.report}")
+
+    if args.baseline:
+        return compare(report, args.baseline, args.tolerance)
+    return 1 if report['errors'] else 0
+
+
+def compare(report, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, result in report['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if before and result['median_ms'] > before['median_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: median {before['median_ms']} ms -> {result['median_ms']} ms")
+    if baseline.get('meta', {}).get('table_rows') != report['meta']['table_rows']:
+        print("Note: the baseline was taken with different table sizes")
+    print("\n".join(regressions) if regressions else "No regressions against the baseline")
+    return 1 if regressions or report['errors'] else 0
+
+
+def generate(args):
+    from bench.synthetic import generate as generate_rows, table_sizes
+    start = time.perf_counter()
+    generate_rows(args.customers, seed=args.seed,
+                  progress=lambda n: print(f"\r{n} / {args.customers} customers", end="", flush=True))
+    print(f"\nGenerated in {time.perf_counter() - start:.1f}s: {table_sizes()}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Synthetic data and query benchmarks")
+    parser.add_argument("--database", default=BENCH_DATABASE, help="database to use (default %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="add synthetic orders")
+    gen.add_argument("--customers", type=int, default=10000)
+    gen.add_argument("--seed", type=int, default=42)
+    gen.set_defaults(func=generate)
+
+    bench = commands.add_parser("run", help="time every UI query path and write a JSON report")
+    bench.add_argument("--report", default="bench_report.json")
+    bench.add_argument("--baseline", help="earlier report to compare medians against")
+    bench.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    bench.add_argument("--iterations", type=int, default=20)
+    bench.add_argument("--warmup", type=int, default=2)
+    bench.add_argument("--only", nargs="*", help="case names to run")
+    bench.set_defaults(func=run)
+
+    args = parser.parse_args(argv)
+    use_database(args.database)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
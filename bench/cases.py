@@ -0,0 +1,103 @@
+import os
+import tempfile
+import uuid
+from datetime import date, timedelta
+
+from repository import repo
+
+# One benchmark per query path the UI takes, calling the same query objects and helpers the
+# windows use. Each case is (name, setup) where setup returns the callable that is timed, so
+# imports and one-off preparation stay outside the measurement.
+
+
+def _login_lookup():
+    return lambda: repo.query_one("user_login", ("Omkar",))
+
+
+def _unpaid_first_page():
+    from dashboard import UNPAID_QUERY
+    from virtual_table import fetch_page
+    return lambda: fetch_page(UNPAID_QUERY, 50, None, False, None, False)
+
+
+def _customer_changes():
+    since = repo.query_one("customers_watermark").updated_at
+    return lambda: repo.query("customer_changes", (since,))
+
+
+def _bill_suggestions():
+    from bill_lookup import BillLookup
+    return lambda: BillLookup.search("B00")
+
+
+def _search(**fields):
+    def setup():
+        from customer_search import search_query
+        from virtual_table import fetch_page
+        query = search_query(**fields)
+        return lambda: fetch_page(query, 50, None, False, None, False)
+    return setup
+
+
+def _stock_catalogue_load():
+    from stock_catalogue import StockCatalogue
+    return lambda: StockCatalogue().load()
+
+
+def _stock_catalogue_probe():
+    from stock_catalogue import StockCatalogue
+    catalogue = StockCatalogue()
+    catalogue.load()
+    return catalogue.refresh
+
+
+def _sales_report(cached):
+    def setup():
+        from report_cache import ReportCache
+        end = date.today()
+        start = end - timedelta(days=210)
+        reports = ReportCache()
+        if cached:
+            reports.get("daily", start, end)
+            return lambda: reports.get("daily", start, end)
+        return lambda: ReportCache().get("daily", start, end)
+    return setup
+
+
+def _save_order():
+    # The counter's save path: journal the order, then flush it to the server. Writes a real
+    # order per iteration (with a fresh bill and spectacles number) to a throwaway journal.
+    from order_journal import OrderJournal
+    frame, type_ = next((row.frame, row.type) for row in repo.query("stock_catalogue") if row.count > 100)
+    journal = OrderJournal(os.path.join(tempfile.mkdtemp(prefix="bench-journal-"), "orders.db"))
+
+    def order():
+        tag = uuid.uuid4().hex[:12]
+        customer = ("Bench Customer", "9000000000", f"BENCH-{tag}", date.today().isoformat(), "1990-01-01", frame, type_,
+                    1000, 0, 1000, 0, "Single Vision", "Paid", "benchmark")
+        journal.append(customer, [0.5, 0, 0, 0.5, 0, 0], [1.5, 0, 0, 1.5, 0, 0], f"BENCH-{tag}")
+        return journal.flush()
+    return order
+
+
+def _stock_first_page():
+    from admin_dashboard import STOCK_QUERY
+    from virtual_table import fetch_page
+    return lambda: fetch_page(STOCK_QUERY, 50, None, False, None, False)
+
+
+CASES = [
+    ("login_lookup", _login_lookup),
+    ("load_customers_full", _unpaid_first_page),
+    ("load_customers_incremental", _customer_changes),
+    ("fetch_bill_numbers", _bill_suggestions),
+    ("search_phone_prefix", _search(phone_no="98")),
+    ("search_bill_no", _search(bill_no="B0000100")),
+    ("search_unique_no", _search(unique_no="U0000010")),
+    ("get_options_load", _stock_catalogue_load),
+    ("get_options_probe", _stock_catalogue_probe),
+    ("fetch_sales_data_cold", _sales_report(cached=False)),
+    ("fetch_sales_data_cached", _sales_report(cached=True)),
+    ("insert_data", _save_order),
+    ("fetch_data", _stock_first_page),
+]
@@ -0,0 +1,114 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+from db_config import get_connection
+
+# Realistic-looking rows for customers, eye_prescriptions, spectacles_no and stocks. Ids are
+# assigned here (continuing after the current maximum) so child rows can reference their
+# customer without reading anything back. Every INSERT goes through the schema's triggers,
+# so the sales rollups stay consistent with the generated orders; the stock each batch sells
+# is taken off Stocks in the same transaction, as the counters' reservations would.
+
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Sai", "Arjun", "Ishaan", "Rohan", "Kabir", "Ananya", "Diya",
+               "Priya", "Sneha", "Pooja", "Kavya", "Meera", "Neha", "Rahul", "Amit", "Sunita", "Lakshmi"]
+LAST_NAMES = ["Patil", "Sharma", "Deshmukh", "Kulkarni", "Joshi", "Pawar", "Shinde", "Jadhav", "More", "Gaikwad",
+              "Chavan", "Kale", "Naik", "Rao", "Iyer", "Gupta", "Mehta", "Shah", "Verma", "Singh"]
+FRAMES = ["Rayban", "Titan", "Fastrack", "Vogue", "Lenskart", "Oakley", "Police", "Carrera", "Idee", "Prada"]
+TYPES = ["Full Rim", "Half Rim", "Rimless", "Round", "Aviator", "Wayfarer", "Cat Eye", "Sports"]
+LENSES = ["Single Vision", "Bifocal", "Progressive", "Blue Cut", "Photochromic", "Anti Glare"]
+REMARKS = ["Deliver in 3 days", "Urgent", "Check fitting", "Repeat customer", "Call before delivery"]
+
+INSERT_BATCH = 1000
+ORDER_DAYS = 3 * 365        # orders spread over the last three years
+UNPAID_SHARE = 0.2
+
+
+def _power(rng):
+    return round(rng.choice([-1, 1]) * rng.randint(0, 24) * 0.25, 2)
+
+
+def _next_id(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _flush(cursor, sql, rows):
+    if rows:
+        cursor.executemany(sql, rows)
+        rows.clear()
+
+
+def generate_stocks(cursor, customers, rng):
+    # Every Frame/Type pair, stocked deep enough for all generated orders
+    rows = [(frame, type_, customers + rng.randint(10, 200), date.today()) for frame in FRAMES for type_ in TYPES]
+    cursor.executemany("INSERT INTO Stocks (Frame, Type, Count, Date) VALUES (%s, %s, %s, %s) "
+                       "ON DUPLICATE KEY UPDATE Count = Count + VALUES(Count)", rows)
+    return [(frame, type_) for frame, type_, _, _ in rows]
+
+
+def generate(customers, seed=42, batch=INSERT_BATCH, progress=None):
+    # Adds `customers` orders (customer, two prescriptions, one spectacles number each)
+    rng = random.Random(seed)
+    today = date.today()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        stock = generate_stocks(cursor, customers, rng)
+        conn.commit()
+        first_customer = _next_id(cursor, "customers")
+        first_prescription = _next_id(cursor, "eye_prescriptions")
+        first_spectacles = _next_id(cursor, "Spectacles_no")
+
+        customer_rows, prescription_rows, spectacles_rows = [], [], []
+        sold = Counter()
+        for n in range(customers):
+            customer_id = first_customer + n
+            frame, type_ = rng.choice(stock)
+            sold[frame, type_] += 1
+            total = rng.randrange(800, 15000, 50)
+            discount = rng.choice([0, 0, 0, 100, 200, 500])
+            payable = total - discount
+            unpaid = rng.random() < UNPAID_SHARE
+            advance = rng.randrange(0, payable, 50) if unpaid else payable
+            customer_rows.append((
+                customer_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                f"{rng.randint(7, 9)}{rng.randint(0, 10 ** 9 - 1):09d}", f"B{customer_id:07d}",
+                today - timedelta(days=rng.randint(0, ORDER_DAYS)), date(rng.randint(1945, 2015), rng.randint(1, 12), rng.randint(1, 28)),
+                frame, type_, total, discount, advance, payable - advance, rng.choice(LENSES),
+                "Not Paid" if payable - advance else "Paid", rng.choice(REMARKS),
+            ))
+            for k, eye_type in enumerate(("Distance", "Reading")):
+                prescription_rows.append((
+                    first_prescription + 2 * n + k, customer_id, eye_type,
+                    _power(rng), _power(rng), rng.randrange(0, 181, 5), _power(rng), _power(rng), rng.randrange(0, 181, 5),
+                ))
+            spectacles_rows.append((first_spectacles + n, customer_id, frame, type_, f"U{first_spectacles + n:08d}"))
+
+            if len(customer_rows) == batch or n == customers - 1:
+                # Parents first in each transaction; the foreign keys are checked row by row
+                _flush(cursor, "INSERT INTO customers (id, name, phone_no, bill_no, order_date, dob, Frame, Type, total_amount, "
+                               "discount, advance_amount, balance_amount, Lens, payment, remark) "
+                               "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", customer_rows)
+                _flush(cursor, "INSERT INTO eye_prescriptions (id, customer_id, eye_type, re_sph, re_cyl, re_axis, le_sph, le_cyl, le_axis) "
+                               "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", prescription_rows)
+                _flush(cursor, "INSERT INTO Spectacles_no (id, customer_id, Frame, Type, unique_no) "
+                               "VALUES (%s, %s, %s, %s, %s)", spectacles_rows)
+                cursor.executemany("UPDATE Stocks SET Count = Count - %s WHERE Frame = %s AND Type = %s",
+                                   [(count, frame, type_) for (frame, type_), count in sold.items()])
+                sold.clear()
+                conn.commit()
+                if progress:
+                    progress(n + 1)
+        cursor.close()
+    return customers
+
+
+def table_sizes():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        sizes = {}
+        for table in ("customers", "eye_prescriptions", "Spectacles_no", "Stocks"):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            sizes[table.lower()] = cursor.fetchone()[0]
+        cursor.close()
+    return sizes
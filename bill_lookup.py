@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+from customer_search import like_prefix
+from repository import repo, BillSummary
+
+BILL_SUGGEST_LIMIT = 20
+LOOKUP_CACHE_SIZE = 256
+
+
+class LRUCache:
+    # Bounded mapping that drops the least recently used key when full. Not thread-safe;
+    # the dashboards only touch it from the Tk thread.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        if key not in self._items:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def discard(self, key):
+        self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+
+class BillLookup:
+    # Autocomplete for the unpaid bill combobox. Each keystroke burst runs one LIMITed prefix
+    # query on the bill_no index; every row it returns (bill_no, balance, name, phone) is kept
+    # in an LRU cache so picking a bill from the list needs no second query.
+    def __init__(self, capacity=LOOKUP_CACHE_SIZE):
+        self.cache = LRUCache(capacity)
+
+    @staticmethod
+    def search(prefix, limit=BILL_SUGGEST_LIMIT):
+        # Worker thread
+        return repo.query("unpaid_bills_by_prefix", (like_prefix(prefix), limit))
+
+    @staticmethod
+    def fetch(bill_no):
+        # Worker thread; for bills typed in full without picking them from the list
+        return repo.query_one("bill_summary", (bill_no,))
+
+    def remember(self, rows):
+        for row in rows:
+            self.cache.put(str(row.bill_no), row)
+
+    def get(self, bill_no):
+        return self.cache.get(bill_no)
+
+    def forget(self, bill_no):
+        self.cache.discard(bill_no)
+
+    def apply_change(self, row):
+        # Keep cached bills in step with the unpaid-bills change feed
+        bill_no = str(row.bill_no)
+        if bill_no in self.cache:
+            self.cache.put(bill_no, BillSummary(row.bill_no, row.balance_amount, row.name, row.phone_no))
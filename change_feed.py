@@ -0,0 +1,133 @@
+import asyncio
+import queue
+import sys
+import threading
+
+from db_config import CHANGE_FEED_CONFIG
+from repository import repo
+
+# Counters learn about writes made elsewhere in two ways:
+#  * each topic ('customers', 'stocks') has a version: the table's newest id and newest
+#    updated_at, both read off an index. A counter's refresh tick probes them and only
+#    refreshes the views whose topic moved, instead of re-reading the unpaid list every time.
+#    Deletes leave no trace in the version; the periodic full sync and broadcasts cover them.
+#  * `python change_feed.py serve` is a small TCP broadcaster. A window that writes publishes
+#    the topic as a line of text and every other connected window refreshes at once; while
+#    connected, counters fall back to a slow safety tick. Without it everything still works
+#    through the version probe alone.
+
+TOPICS = ("customers", "stocks")
+
+
+class ChangeFeed:
+    # probe() reads the versions on a worker thread; the Tk thread compares them with changed()
+    # and records a topic's version with applied() only once its views were refreshed, so a
+    # failed or superseded refresh is tried again on the next tick
+    def __init__(self):
+        self.versions = {}      # topic -> version the views were last refreshed to
+
+    @staticmethod
+    def probe():
+        row = repo.query_one("change_versions")
+        return {"customers": (row.customer_id, row.customers_updated), "stocks": (row.stock_no, row.stocks_updated)}
+
+    def changed(self, versions):
+        return {topic for topic in TOPICS if versions[topic] != self.versions.get(topic)}
+
+    def applied(self, topic, version):
+        self.versions[topic] = version
+
+
+class Broadcaster:
+    # Relays every line a client sends to all other clients
+    def __init__(self):
+        self.clients = set()
+
+    async def handle(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                for client in list(self.clients):
+                    if client is not writer:
+                        client.write(line)
+                for client in list(self.clients):
+                    try:
+                        await client.drain()
+                    except ConnectionError:
+                        self.clients.discard(client)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Change broadcaster listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+class BroadcastClient:
+    # Keeps a connection to the broadcaster on its own thread and event loop, reconnecting
+    # in the background. Topics announced by others land in `received` for the Tk thread.
+    def __init__(self, host=CHANGE_FEED_CONFIG['host'], port=CHANGE_FEED_CONFIG['port'],
+                 retry=CHANGE_FEED_CONFIG['retry']):
+        self.host = host
+        self.port = port
+        self.retry = retry
+        self.received = queue.Queue()
+        self.connected = False
+        self._writer = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="change-feed", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+        return self
+
+    async def _run(self):
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(self.host, self.port)
+                self.connected = True
+                while line := await reader.readline():
+                    topic = line.decode(errors="replace").strip()
+                    if topic in TOPICS:
+                        self.received.put(topic)
+            except OSError:
+                pass
+            self.connected = False
+            self._writer = None
+            await asyncio.sleep(self.retry)
+
+    def publish(self, *topics):
+        # Safe to call from any thread; dropped when the broadcaster is not reachable
+        def send():
+            if self._writer is not None:
+                self._writer.write("".join(f"{topic}\n" for topic in topics).encode())
+        self._loop.call_soon_threadsafe(send)
+
+    def drain(self):
+        topics = set()
+        while True:
+            try:
+                topics.add(self.received.get_nowait())
+            except queue.Empty:
+                return topics
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["serve"]:
+        host = CHANGE_FEED_CONFIG['host'] if len(sys.argv) < 3 else sys.argv[2]
+        try:
+            asyncio.run(Broadcaster().serve(host, CHANGE_FEED_CONFIG['port']))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print("Usage: python change_feed.py serve [listen address]")
+        sys.exit(2)
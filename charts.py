@@ -0,0 +1,90 @@
+import math
+import threading
+import tkinter as tk
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image, ImageTk
+
+MIN_BAR_PX = 3      # narrower bars are merged into bins
+MAX_TICKS = 15
+
+
+def downsample(labels, values, max_bars):
+    # Sum consecutive periods into equal bins when there are more bars than the axes can show
+    if len(values) <= max_bars:
+        return labels, values
+    size = math.ceil(len(values) / max_bars)
+    binned_labels, binned_values = [], []
+    for i in range(0, len(values), size):
+        chunk = labels[i:i + size]
+        binned_labels.append(chunk[0] if len(chunk) == 1 else f"{chunk[0]}–{chunk[-1]}")
+        binned_values.append(sum(values[i:i + size]))
+    return binned_labels, binned_values
+
+
+class ChartWindow:
+    # One persistent chart window per report. The figure is kept between reports and only its
+    # bar data is replaced; drawing happens with the Agg backend on a worker thread and the
+    # finished bitmap is shown in the window. Closing the window hides it for reuse.
+    def __init__(self, master, executor, title, ylabel="Amount", color=None, size=(600, 400), dpi=100):
+        self.master = master
+        self.executor = executor
+        self.title = title
+        self.color = color
+        self.figure = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.ax.set_title(title)
+        self.ax.set_ylabel(ylabel)
+        self.figure.subplots_adjust(bottom=0.25)
+        self.bars = None
+        self.labels = []
+        self.top = None
+        self.image_label = None
+        self.photo = None
+        self._lock = threading.Lock()    # one render at a time per figure
+        self._job_key = f"chart-{id(self)}"
+
+    def show(self, data):
+        labels = sorted(data)
+        values = [float(data[k]) for k in labels]
+        self.executor.submit(self._render, labels, values, callback=self._display, key=self._job_key)
+
+    def _max_bars(self):
+        width_px = self.figure.get_figwidth() * self.figure.dpi * self.ax.get_position().width
+        return max(int(width_px // MIN_BAR_PX), 1)
+
+    def _render(self, labels, values):
+        with self._lock:
+            labels, values = downsample(labels, values, self._max_bars())
+            if self.bars is not None and labels == self.labels:
+                for bar, value in zip(self.bars, values):
+                    bar.set_height(value)
+            else:
+                if self.bars is not None:
+                    self.bars.remove()
+                positions = range(len(values))
+                self.bars = self.ax.bar(positions, values, color=self.color)
+                step = max(math.ceil(len(labels) / MAX_TICKS), 1)
+                self.ax.set_xticks(list(positions)[::step])
+                self.ax.set_xticklabels(labels[::step], rotation=45, ha="right")
+                self.labels = labels
+            self.ax.relim()
+            self.ax.autoscale_view()
+            self.canvas.draw()
+            width, height = self.canvas.get_width_height()
+            return Image.frombuffer("RGBA", (width, height), bytes(self.canvas.buffer_rgba()), "raw", "RGBA", 0, 1)
+
+    def _display(self, image):
+        if self.top is None or not self.top.winfo_exists():
+            self.top = tk.Toplevel(self.master)
+            self.top.title(self.title)
+            self.top.protocol("WM_DELETE_WINDOW", self.top.withdraw)
+            self.image_label = tk.Label(self.top)
+            self.image_label.pack(fill='both', expand=True)
+        # PhotoImage must be created on the Tk thread; keep a reference so it is not collected
+        self.photo = ImageTk.PhotoImage(image)
+        self.image_label.config(image=self.photo)
+        self.top.deiconify()
+        self.top.lift()
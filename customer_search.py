@@ -0,0 +1,96 @@
+import sys
+
+from db_config import DB_BACKEND
+from repository import repo, record, PrescriptionRow
+from virtual_table import KeysetQuery
+
+# Prescription search for the Details of Spectacles tab. Each filled-in field is its own
+# prefix lookup on an index (customers.phone_no, customers.bill_no, Spectacles_no.unique_no);
+# the branches are UNIONed (deduplicating customers found by more than one field) and only
+# the matching customers are joined to their prescriptions and spectacles numbers. Rows of
+# one customer stay together under every sort because the customer id breaks ties.
+
+SEARCH_BRANCHES = {
+    "phone_no": "SELECT id FROM customers WHERE phone_no LIKE %s",
+    "bill_no": "SELECT id FROM customers WHERE bill_no LIKE %s",
+    "unique_no": "SELECT customer_id AS id FROM Spectacles_no WHERE unique_no LIKE %s",
+}
+
+SEARCH_COLUMNS = """
+    SELECT customers.id, customers.name, customers.phone_no, customers.bill_no, customers.remark,
+           eye_prescriptions.eye_type, eye_prescriptions.re_sph, eye_prescriptions.re_cyl,
+           eye_prescriptions.re_axis, eye_prescriptions.le_sph, eye_prescriptions.le_cyl,
+           eye_prescriptions.le_axis,
+           COALESCE(eye_prescriptions.id, 0), COALESCE(Spectacles_no.id, 0)
+    """
+SEARCH_JOINS = """
+    JOIN customers ON customers.id = matched.id
+    LEFT JOIN eye_prescriptions ON customers.id = eye_prescriptions.customer_id
+    LEFT JOIN Spectacles_no ON customers.id = Spectacles_no.customer_id
+    """
+SEARCH_KEY = [("customers.id", 0), ("COALESCE(eye_prescriptions.id, 0)", 12), ("COALESCE(Spectacles_no.id, 0)", 13)]
+SEARCH_SORTABLE = {"ID": ("customers.id", 0), "Name": ("customers.name", 1), "Phone": ("customers.phone_no", 2), "Bill No": ("customers.bill_no", 3)}
+
+ExplainRow = record("ExplainRow", "id", "select_type", "table", "partitions", "type", "possible_keys",
+                    "key", "key_len", "ref", "rows", "filtered", "extra")
+QueryPlanRow = record("QueryPlanRow", "id", "parent", "notused", "detail")
+ScanStep = record("ScanStep", "table")
+
+
+def like_prefix(text):
+    # Match values starting with `text`; wildcards typed by the user are taken literally
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_query(phone_no="", bill_no="", unique_no="", customer_ids=()):
+    # `customer_ids` are exact matches already resolved elsewhere (type-ahead picks, name
+    # prefixes from the in-memory index). Returns None when there is nothing to search for.
+    values = {"phone_no": phone_no, "bill_no": bill_no, "unique_no": unique_no}
+    branches = [(SEARCH_BRANCHES[field], [like_prefix(value)]) for field, value in values.items() if value]
+    if customer_ids:
+        # Pad the list to a power of two so only a few IN () shapes ever get prepared
+        ids = list(customer_ids)
+        ids += ids[-1:] * ((1 << (len(ids) - 1).bit_length()) - len(ids))
+        branches.append((f"SELECT id FROM customers WHERE id IN ({', '.join(['%s'] * len(ids))})", ids))
+    if not branches:
+        return None
+    matched = " UNION ".join(sql for sql, _ in branches)
+    select = f"{SEARCH_COLUMNS} FROM ({matched}) AS matched {SEARCH_JOINS}"
+    return KeysetQuery(select, SEARCH_KEY, SEARCH_SORTABLE, params=[p for _, params in branches for p in params],
+                       name="prescription_search_page", record=PrescriptionRow)
+
+
+def full_scans(query, sort=None, limit=50):
+    # EXPLAIN the first page and return a ScanStep for each plan step that reads a whole table or index.
+    # Derived and union result tables (<derived2>, <union2,3>) only hold the matched ids.
+    sql, params = query.page(limit, sort)
+    if DB_BACKEND == 'sqlite':
+        # "SCAN customers" reads the table, "SCAN customers USING INDEX ..." a whole index;
+        # SEARCH steps use an index range and "matched" only holds the matched ids
+        plan = repo.query_sql("explain_search", "EXPLAIN QUERY PLAN " + sql, params, QueryPlanRow)
+        steps = [row.detail.split() for row in plan]
+        return [ScanStep(step[1]) for step in steps if step[0] == "SCAN" and step[1] != "matched"]
+    plan = repo.query_sql("explain_search", "EXPLAIN " + sql, params, ExplainRow)
+    return [ScanStep(row.table) for row in plan if row.type in ("ALL", "index") and not str(row.table).startswith("<")]
+
+
+def check_plans(sample="1"):
+    # Every branch alone, all of them together, under every sort order
+    fields = list(SEARCH_BRANCHES)
+    combinations = [[field] for field in fields] + [fields]
+    problems = []
+    for combination in combinations:
+        query = search_query(**{field: sample for field in combination})
+        for sort in [None, *SEARCH_SORTABLE]:
+            for row in full_scans(query, sort):
+                problems.append(f"{'+'.join(combination)} sorted by {sort or 'id'}: full scan of {row.table}")
+    return problems
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["explain"]:
+        problems = check_plans(*sys.argv[2:3])
+        print("\n".join(problems) if problems else "No search branch scans a full table")
+        sys.exit(1 if problems else 0)
+    print("Usage: python customer_search.py explain [sample prefix]")
+    sys.exit(2)
@@ -2,9 +2,39 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 from datetime import date
-from db_config import get_connection
-from mysql.connector import IntegrityError,InterfaceError,Error
+from db_config import get_connection, CHANGE_FEED_CONFIG
+from db_worker import QueryExecutor
+from virtual_table import KeysetQuery, VirtualTable
+from repository import repo, UnpaidBill
+from customer_search import search_query
+from search_index import CustomerIndex
+from bill_lookup import BillLookup
+from stock_catalogue import StockCatalogue, SYNC_OVERLAP
+from instrumentation import metrics
+from change_feed import ChangeFeed, BroadcastClient, TOPICS
+from order_journal import OrderJournal, DuplicateOrder, OutOfStock, UNREACHABLE, reserve_stock, release_stock
+from startup import preloaded
 import gc
+
+FULL_SYNC_EVERY = 60                   # refresh ticks between full unpaid-bills reloads
+REFRESH_MS = 5000                      # change-version probe interval
+SAFETY_REFRESH_MS = 30000              # probe interval while the broadcaster announces changes
+MAX_BACKOFF_MS = 60000                 # longest wait between probes after repeated errors
+ANNOUNCE_POLL_MS = 250
+JOURNAL_RETRY_MS = 15000               # next flush attempt while orders are still waiting to be sent
+SUGGEST_DELAY_MS = 150                 # typing pause before suggestions are shown
+SUGGEST_LIMIT = 8
+NAME_SEARCH_LIMIT = 200                # customers a name prefix may expand to
+
+UNPAID_QUERY = KeysetQuery(
+    "SELECT bill_no, name, phone_no, balance_amount FROM customers",
+    key=[("bill_no", 0)],
+    sortable={"billno": ("bill_no", 0), "name": ("name", 1), "phone": ("phone_no", 2), "balance": ("balance_amount", 3)},
+    where="payment = 'Not Paid'",
+    name="unpaid_bills_page",
+    record=UnpaidBill,
+)
+
 class UserDashboard:
     def __init__(self, master):
         self.master = master
@@ -12,14 +42,40 @@ class UserDashboard:
         self.master.attributes('-fullscreen', True)
         self.master.bind("<Escape>", lambda e: self.master.attributes("-fullscreen", False))
         self.master.protocol("WM_DELETE_WINDOW", self.close_app)
-        self.frame_cache = None
-        self.type_cache = {}
+        self.catalogue = preloaded.pop('catalogue', None) or StockCatalogue()  # loaded behind the splash screen on a normal start
+        self.refresh_job = None
+        self.customer_watermark = None # newest customers.updated_at applied to the tree
+        self.customer_max_id = 0        # newest customers.id applied to the tree
+        self.sync_ticks = -1
+        self.search_index = CustomerIndex()
+        self.changes = ChangeFeed()
+        self.announced = set()          # topics other windows announced; refreshed even when the probe shows no move
+        self.refresh_failures = 0
+        self.broadcast = BroadcastClient().start() if CHANGE_FEED_CONFIG['enabled'] else None
+        self.suggest_job = None
+        self.suggest_results = []
+        self.bill_lookup = BillLookup()
+        self.bill_suggest_job = None
+        self.journal = OrderJournal()
+        self.journal_job = None
+        self.db = QueryExecutor(self.master, on_busy=self.set_busy)
         self.setup_ui()
+        # Orders left in the journal by an earlier session go out first
+        self.flush_journal()
+        if self.broadcast:
+            self._check_announcements()
     
     def close_app(self):
+        self.db.shutdown()
+        if self.broadcast:
+            self.broadcast.stop()
         self.master.destroy()
         gc.collect()
 
+    def set_busy(self, busy):
+        self.master.config(cursor="watch" if busy else "")
+        self.status_label.config(text="Working..." if busy else "")
+
     # Utility Functions
     @staticmethod
     def parse_float(value):
@@ -33,19 +89,24 @@ class UserDashboard:
         self.master.rowconfigure(1, weight=1)
 
         tk.Label(self.master, text="Welcome to Omkar Optics Userdashboard", font=("Arial", 18)).grid(row=0, column=0, pady=10)
-
-        notebook = ttk.Notebook(self.master)
-        notebook.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
-
-        self.tab1 = tk.Frame(notebook)
-        self.tab2 = tk.Frame(notebook)
-        self.tab3 = tk.Frame(notebook)
-        notebook.add(self.tab1, text="Customer Details")
-        notebook.add(self.tab2, text="Update Details")
-        notebook.add(self.tab3, text="Details of Spectacles")
+        self.status_label = tk.Label(self.master, text="", font=("Arial", 10), fg="gray")
+        self.status_label.grid(row=3, column=0, sticky="w", padx=10)
+
+        self.notebook = ttk.Notebook(self.master)
+        self.notebook.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+
+        self.tab1 = tk.Frame(self.notebook)
+        self.tab2 = tk.Frame(self.notebook)
+        self.tab3 = tk.Frame(self.notebook)
+        self.tab4 = tk.Frame(self.notebook)
+        self.notebook.add(self.tab1, text="Customer Details")
+        self.notebook.add(self.tab2, text="Update Details")
+        self.notebook.add(self.tab3, text="Details of Spectacles")
+        self.notebook.add(self.tab4, text="Order Sync")
         self.build_customer_tab()
         self.update_customer_tab()
         self.details_spec_tab()
+        self.order_sync_tab()
 
         tk.Button(self.master, text="Logout", font=("Arial", 12), bg="#0085FF", fg="white", command=self.logout).grid(row=2, column=0, pady=10)
 
@@ -61,10 +122,11 @@ class UserDashboard:
     def update_customer_tab(self):
         tab2 = self.tab2
         tk.Label(tab2, text="Bill No:", font=("Arial", 12)).grid(row=0, column=0, padx=10, pady=5, sticky="w")
-        bill_numbers = self.fetch_bill_numbers()
-        self.frame_up_combobox = ttk.Combobox(tab2,values=bill_numbers,font=("Arial", 12), width=28)
+        self.frame_up_combobox = ttk.Combobox(tab2,values=[],font=("Arial", 12), width=28)
         self.frame_up_combobox.grid(row=0, column=1, padx=10, pady=5)
         self.frame_up_combobox.bind("<<ComboboxSelected>>", self.on_bill_selected)
+        self.frame_up_combobox.bind("<KeyRelease>", self.schedule_bill_suggestions)
+        self.frame_up_combobox.bind("<Return>", self.on_bill_selected)
 
         tk.Button(tab2, text="Update Billno", font=("Arial", 12), bg="green", fg="white",command=self.update_balance).grid(row=0, column=3, columnspan=2, padx=10, pady=5)
         tk.Button(tab2, text="Refresh Button for Billno", font=("Arial", 12), bg="blue", fg="white",command=self.refresh_combobox2).grid(row=0, column=5, columnspan=2, padx=10, pady=5)
@@ -77,31 +139,30 @@ class UserDashboard:
         tab2.grid_columnconfigure(1, weight=1)
 
         columns = ("billno", "name", "phone", "balance")
-        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=10)
-        for col in columns: 
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100, anchor=tk.CENTER)
-    
-        vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
-        vsb.pack(side="right", fill="y")
+        self.tree = VirtualTable(tree_frame, columns, query=UNPAID_QUERY, executor=self.db, height=10, anchor=tk.CENTER,
+                                 on_error=lambda e: messagebox.showerror("Database Error", f"Error loading customers: {e}"))
         self.tree.pack(fill="both", expand=True)
 
 
         self.load_customers()
+        self.fetch_bill_suggestions()
     def on_bill_selected(self, event=None):
         selected_bill = self.frame_up_combobox.get()
         if not selected_bill:
             return
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT balance_amount FROM customers WHERE bill_no = %s", (selected_bill,))
-        result = cursor.fetchone()
-        conn.close()
+        # Bills picked from the suggestion list were cached with their balance by the prefix query
+        cached = self.bill_lookup.get(selected_bill)
+        if cached is not None:
+            self.show_bill_balance(selected_bill, cached)
+        else:
+            self.db.submit(self.bill_lookup.fetch, selected_bill, key="bill_lookup",
+                           callback=lambda result: self.show_bill_balance(selected_bill, result))
 
+    def show_bill_balance(self, selected_bill, result):
         if result:
-            balance_amt = result[0]
+            self.bill_lookup.remember([result])
+            balance_amt = result.balance_amount
             self.balance_up_amt.config(state="normal")
             self.balance_up_amt.delete(0, tk.END)
             self.balance_up_amt.insert(0, str(balance_amt))
@@ -109,21 +170,28 @@ class UserDashboard:
         else:
             print(f"No balance found for Bill No {selected_bill}")
 
+    def schedule_bill_suggestions(self, event):
+        if event.keysym in ("Down", "Up", "Return", "Tab", "Escape"):
+            return
+        if self.bill_suggest_job is not None:
+            self.master.after_cancel(self.bill_suggest_job)
+        self.bill_suggest_job = self.master.after(SUGGEST_DELAY_MS, self.fetch_bill_suggestions)
+
+    def fetch_bill_suggestions(self):
+        self.bill_suggest_job = None
+        self.db.submit(self.bill_lookup.search, self.frame_up_combobox.get().strip(), key="bill_suggestions",
+                       callback=self.show_bill_suggestions)
+
+    def show_bill_suggestions(self, rows):
+        self.bill_lookup.remember(rows)
+        self.frame_up_combobox["values"] = [row.bill_no for row in rows]
 
     def refresh_combobox2(self):
-        self.frame_up_combobox["values"] = self.fetch_bill_numbers()
         self.frame_up_combobox.set("")
         self.balance_up_amt.config(state="normal")
         self.balance_up_amt.delete(0, tk.END)
         self.balance_up_amt.config(state="readonly")
-    
-    def fetch_bill_numbers(self):
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT bill_no FROM customers WHERE payment='Not Paid'")
-        result = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return result
+        self.fetch_bill_suggestions()
 
 
     def update_balance(self):
@@ -131,39 +199,135 @@ class UserDashboard:
         if not selected_bill:
             return
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT balance_amount, advance_amount FROM customers WHERE bill_no = %s", (selected_bill,))
-        result = cursor.fetchone()
+        with get_connection() as conn:
+            result = repo.query_one("bill_amounts", (selected_bill,), conn)
+
+            if result:
+                new_advance_amount = result.balance_amount + result.advance_amount
+                repo.execute("mark_bill_paid", (new_advance_amount, selected_bill), conn)
+                conn.commit()
 
         if result:
-            new_advance_amount = result[0] + result[1]  # balance_amt + advance_amt
-            cursor.execute("UPDATE customers SET advance_amount = %s, balance_amount = 0, payment='Paid' WHERE bill_no = %s", (new_advance_amount, selected_bill))
+            self.bill_lookup.forget(selected_bill)
+            if self.broadcast:
+                self.broadcast.publish("customers")
             messagebox.showinfo("Payment Update", f"Bill No {selected_bill} has been marked as Paid.")
-            conn.commit()
-
-        conn.close()
         self.frame_up_combobox.set("")
         self.balance_up_amt.config(state="normal")
         self.balance_up_amt.delete(0, tk.END)
         self.balance_up_amt.config(state="readonly")
         self.load_customers()
 
+    @metrics.timed("ui:load_customers")
     def load_customers(self):
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT bill_no, name, phone_no, balance_amount FROM customers WHERE payment=%s", ('Not Paid',))
-            rows = cursor.fetchall()
+        # Only one refresh loop may be scheduled; manual reloads reset the timer
+        if self.refresh_job is not None:
+            self.master.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        self.sync_ticks += 1
+        # A periodic full pass picks up deleted rows, which leave no watermark behind
+        full = self.customer_watermark is None or self.sync_ticks % FULL_SYNC_EVERY == 0
+        # One probe of the change versions decides which views need refreshing at all
+        self.db.submit(self.changes.probe, key="change_versions", errback=self._load_customers_failed,
+                       callback=lambda versions: self._refresh_topics(versions, full))
+
+    def _refresh_topics(self, versions, full):
+        # A topic's version is recorded only after its refresh succeeded (see change_feed.py)
+        topics = set(TOPICS) if full else self.changes.changed(versions) | self.announced
+        if "stocks" in topics:
+            self.db.submit(self.catalogue.refresh, key="stock_catalogue",
+                           callback=lambda changed: self._stocks_refreshed(changed, versions["stocks"]))
+        if "customers" not in topics:
+            self._schedule_refresh()
+            return
+        version = versions["customers"]
+        if full:
+            self.db.submit(self._sync_customers, None, callback=lambda watermark: self._reload_customers(watermark, version),
+                           errback=self._load_customers_failed, key="load_customers")
+        else:
+            self.db.submit(self._sync_customers, self.customer_watermark,
+                           callback=lambda result: self._patch_customers(result, version),
+                           errback=self._load_customers_failed, key="load_customers")
+
+    def _stocks_refreshed(self, changed, version):
+        self.changes.applied("stocks", version)
+        self.announced.discard("stocks")
+        self._catalogue_refreshed(changed)
+
+    def _customers_applied(self, version):
+        self.changes.applied("customers", version)
+        self.announced.discard("customers")
+
+    def _schedule_refresh(self, failed=False):
+        self.refresh_failures = self.refresh_failures + 1 if failed else 0
+        if failed:
+            delay = min(REFRESH_MS * 2 ** self.refresh_failures, MAX_BACKOFF_MS)
+        elif self.broadcast is not None and self.broadcast.connected:
+            delay = SAFETY_REFRESH_MS
+        else:
+            delay = REFRESH_MS
+        self.refresh_job = self.master.after(delay, self.load_customers)
+
+    def _check_announcements(self):
+        # Another window wrote something; probe now instead of waiting for the next tick
+        topics = self.broadcast.drain()
+        if topics:
+            self.announced |= topics
+            self.load_customers()
+        self.master.after(ANNOUNCE_POLL_MS, self._check_announcements)
+
+    def _sync_customers(self, watermark):
+        # Worker thread; customers added at other counters reach the type-ahead index on the same tick
+        self.search_index.refresh()
+        return self._query_watermark() if watermark is None else self._query_changes(watermark)
 
-            self.tree.delete(*self.tree.get_children())
-            for row in rows:
-                self.tree.insert("", "end", values=row)
+    @staticmethod
+    def _query_watermark():
+        return repo.query_one("customers_watermark").updated_at
 
-            conn.close()
-        except Exception as e:
+    @staticmethod
+    def _query_changes(watermark):
+        # Overlap the window so rows committed late with an older timestamp are not missed
+        rows = repo.query("customer_changes", (watermark - SYNC_OVERLAP,))
+        if rows:
+            watermark = max(watermark, rows[-1].updated_at)  # rows are ordered by updated_at
+        return rows, watermark
+
+    def _reload_customers(self, watermark, version):
+        # The watermark is read before the first page, so anything changed in between is re-read next tick
+        self.customer_watermark = watermark
+        self.customer_max_id = version[0] or 0
+        self.tree.reload()
+        self._customers_applied(version)
+        self._schedule_refresh()
+
+    def _patch_customers(self, result, version):
+        rows, watermark = result
+        # Every order added up to the probed id must be among the changes. One that committed
+        # long after its updated_at was stamped (a journal batch over a slow link) falls behind
+        # the overlap window, so it is fetched by a full reload instead; an id gap left by a
+        # rolled-back insert costs one reload as well.
+        newest = version[0] or 0
+        if sum(self.customer_max_id < row.id <= newest for row in rows) != newest - self.customer_max_id:
+            self.db.submit(self._sync_customers, None, callback=lambda watermark: self._reload_customers(watermark, version),
+                           errback=self._load_customers_failed, key="load_customers")
+            return
+        self.customer_watermark = watermark
+        self.customer_max_id = newest
+        for row in rows:
+            self.bill_lookup.apply_change(row)
+            if row.payment == 'Not Paid':
+                self.tree.upsert(UnpaidBill(row.bill_no, row.name, row.phone_no, row.balance_amount))
+            else:
+                self.tree.remove(str(row.bill_no))
+        self._customers_applied(version)
+        self._schedule_refresh()
+
+    def _load_customers_failed(self, e):
+        # Only the first failure in a row is shown; retries back off until the database answers
+        if self.refresh_failures == 0:
             messagebox.showerror("Database Error", f"Error loading customers: {e}")
-        self.master.after(5000, self.load_customers)
+        self._schedule_refresh(failed=True)
 
     def build_customer_tab(self):
         tab = self.tab1
@@ -203,32 +367,28 @@ class UserDashboard:
         self.build_table(tab)
         self.build_billing_fields(tab)
         self.remark= self.build_labeled_entry(tab, "Remark", 12, 0)
-        tk.Button(tab, text="Insert Customer Data", font=("Arial", 12), bg="green", fg="white", command=self.insert_data).grid(row=13, column=0, columnspan=2, padx=10, pady=5)
+        self.insert_button = tk.Button(tab, text="Insert Customer Data", font=("Arial", 12), bg="green", fg="white", command=self.insert_data)
+        self.insert_button.grid(row=13, column=0, columnspan=2, padx=10, pady=5)
     def get_options(self,column,frame=None):
-        if frame:
-            if frame in self.type_cache:
-                return self.type_cache[frame]
-        elif self.frame_cache is not None:
-            return self.frame_cache
-        with get_connection() as conn:
-            cursor=conn.cursor()
-            if frame:
-                cursor.execute("SELECT DISTINCT Type FROM Stocks WHERE Frame = %s AND Count > 0", (frame,))
-                result = [row[0] for row in cursor.fetchall()]
-                self.type_cache[frame] = result
-            else:
-                cursor.execute(f"SELECT DISTINCT {column} FROM Stocks WHERE Count > 0")
-                result = [row[0] for row in cursor.fetchall()]
-                self.frame_cache = result
-        return result
+        if not self.catalogue.loaded:
+            self.catalogue.load()
+        return self.catalogue.types(frame) if frame else self.catalogue.frames()
     
     def refresh_data(self):
-        self.frame_cache=None
-        self.type_cache.clear()
+        # Version probe; only rows changed since the last sync are re-read
+        self.db.submit(self.catalogue.refresh, key="stock_catalogue", callback=self._catalogue_refreshed,
+                       errback=lambda e: messagebox.showerror("Database Error", f"Error refreshing stock: {e}"))
+
+    def _catalogue_refreshed(self, changed):
+        if not changed:
+            return
         self.frame_combobox["values"] = self.get_options("Frame")
-        self.frame_combobox.set("Select Frame")
-        self.type_combobox.set("Select Type")
-        self.type_combobox["values"] = []
+        frame = self.frame_combobox.get()
+        if frame in self.frame_combobox["values"]:
+            types = self.get_options("Type", frame)
+            self.type_combobox["values"] = types or ["No Types Available"]
+            if self.type_combobox.get() not in types:
+                self.type_combobox.set("Select Type")
     
     def update_type_options(self, event):
         try:
@@ -247,11 +407,21 @@ class UserDashboard:
         self.bill_no_search = self.build_labeled_entry(form_frame, "Bill No", 0, 0)
         self.phone_no_search = self.build_labeled_entry(form_frame, "Phone No", 1, 0)
         self.unique_no_search = self.build_labeled_entry(form_frame, "Unique No", 2, 0)
+        self.name_search = self.build_labeled_entry(form_frame, "Name", 3, 0)
 
         search_btn = tk.Button(
         form_frame, text="Search", font=("Arial", 12), bg="green", fg="white", command=self.search
         )
-        search_btn.grid(row=3, column=0, columnspan=2, pady=5, sticky="w")
+        search_btn.grid(row=4, column=0, columnspan=2, pady=5, sticky="w")
+
+        # Type-ahead: one suggestion list shared by the four fields, placed under the active one
+        self.suggest_list = tk.Listbox(form_frame, font=("Arial", 11), height=SUGGEST_LIMIT, activestyle="dotbox")
+        self.suggest_list.bind("<Double-Button-1>", self.pick_suggestion)
+        self.suggest_list.bind("<Return>", self.pick_suggestion)
+        for field, entry in (("bill_no", self.bill_no_search), ("phone_no", self.phone_no_search),
+                             ("unique_no", self.unique_no_search), ("name", self.name_search)):
+            entry.bind("<KeyRelease>", lambda e, f=field: self.schedule_suggestions(e, f))
+            entry.bind("<Down>", self.focus_suggestions)
 
         tree_frame2 = tk.Frame(tab3)
         tree_frame2.grid(row=1, column=0, columnspan=6, padx=10, pady=10, sticky="nsew")
@@ -260,46 +430,79 @@ class UserDashboard:
         tab3.grid_columnconfigure(0, weight=1)
 
         columns = ("ID", "Name", "Phone", "Bill No","Remark", "Eye Type", "RE SPH", "RE CYL", "RE Axis", "LE SPH", "LE CYL", "LE Axis")
-        self.tree2 = ttk.Treeview(tree_frame2, columns=columns, show="headings", height=10)
-
-        for col in columns:
-            self.tree2.heading(col, text=col)
-            self.tree2.column(col, width=100, anchor="center")
-
-        vsb2 = ttk.Scrollbar(tree_frame2, orient="vertical", command=self.tree2.yview)
-        self.tree2.configure(yscrollcommand=vsb2.set)
-        vsb2.pack(side="right", fill="y")
+        self.tree2 = VirtualTable(tree_frame2, columns, executor=self.db, height=10, anchor="center",
+                                  on_error=lambda e: print(f"Error: {e}"))
         self.tree2.pack(fill="both", expand=True)
 
+    def schedule_suggestions(self, event, field):
+        # Debounced: only the last keystroke of a burst looks anything up, and only in memory
+        if event.keysym in ("Down", "Up", "Return", "Tab", "Escape"):
+            return
+        if self.suggest_job is not None:
+            self.master.after_cancel(self.suggest_job)
+        self.suggest_job = self.master.after(SUGGEST_DELAY_MS, self.show_suggestions, event.widget, field)
+
+    def show_suggestions(self, entry, field):
+        self.suggest_job = None
+        self.suggest_results = self.search_index.suggest(field, entry.get().strip(), SUGGEST_LIMIT)
+        self.suggest_list.delete(0, tk.END)
+        if not self.suggest_results:
+            self.suggest_list.place_forget()
+            return
+        for s in self.suggest_results:
+            self.suggest_list.insert(tk.END, f"{s.value}  -  {s.name}, {s.phone_no}, Bill {s.bill_no}")
+        self.suggest_list.place(in_=entry, x=0, rely=1.0, relwidth=1.5)
+        self.suggest_list.lift()
+
+    def focus_suggestions(self, event=None):
+        if self.suggest_results:
+            self.suggest_list.focus_set()
+            self.suggest_list.selection_clear(0, tk.END)
+            self.suggest_list.selection_set(0)
+            self.suggest_list.activate(0)
+
+    def hide_suggestions(self):
+        if self.suggest_job is not None:
+            self.master.after_cancel(self.suggest_job)
+            self.suggest_job = None
+        self.suggest_results = []
+        self.suggest_list.place_forget()
+
+    def pick_suggestion(self, event=None):
+        picked = self.suggest_list.curselection()
+        if not picked:
+            return
+        suggestion = self.suggest_results[picked[0]]
+        entry = {"bill_no": self.bill_no_search, "phone_no": self.phone_no_search,
+                 "unique_no": self.unique_no_search, "name": self.name_search}[suggestion.field]
+        entry.delete(0, tk.END)
+        entry.insert(0, suggestion.value)
+        self.hide_suggestions()
+        entry.focus_set()
+        # The picked customer is known, so the database is asked for exactly that one
+        self.tree2.set_query(search_query(customer_ids=[suggestion.customer_id]))
+
+    @metrics.timed("ui:search")
     def search(self):
+        self.hide_suggestions()
         bill_no = self.bill_no_search.get().strip()
         phone_no = self.phone_no_search.get().strip()
         unique_no = self.unique_no_search.get().strip() 
-        self.tree2.delete(*self.tree2.get_children())
-        if not bill_no and not phone_no and not unique_no:
+        name = self.name_search.get().strip()
+        # Names have no index; the in-memory one turns the prefix into customer ids
+        customer_ids = self.search_index.customer_ids("name", name, NAME_SEARCH_LIMIT) if name else []
+        if name and not customer_ids and not (bill_no or phone_no or unique_no):
+            self.tree2.set_query(None)
+            messagebox.showinfo("No Results", f"No customer name starts with '{name}'.")
+            return
+        query = search_query(phone_no=phone_no, bill_no=bill_no, unique_no=unique_no, customer_ids=customer_ids)
+        if query is None:
+            self.tree2.set_query(None)
             messagebox.showwarning("Input Required", "Please enter at least one search field.")
             return
-        
-        try:   
-            conn=get_connection()   
-            cursor = conn.cursor()
-            query = """
-    SELECT customers.id, customers.name, customers.phone_no, customers.bill_no,customers.remark, 
-           eye_prescriptions.eye_type, eye_prescriptions.re_sph, eye_prescriptions.re_cyl, 
-           eye_prescriptions.re_axis, eye_prescriptions.le_sph, eye_prescriptions.le_cyl, 
-           eye_prescriptions.le_axis
-    FROM customers
-    LEFT JOIN eye_prescriptions ON customers.id = eye_prescriptions.customer_id
-    LEFT JOIN Spectacles_no ON customers.id = Spectacles_no.customer_id
-    WHERE customers.phone_no = %s OR customers.bill_no = %s OR Spectacles_no.unique_no = %s
-    """
-            cursor.execute(query, (phone_no, bill_no, unique_no))
-            rows = cursor.fetchall()
-            for row in rows:
-                self.tree2.insert("", "end", values=row)
-            conn.close()
-        except Exception as e:
-            print(f"Error: {e}")
+
+        self.tree2.set_query(query)
+
     def build_table(self, tab):
         table_frame = tk.Frame(tab, bg="white")
         table_frame.grid(row=8, column=1, columnspan=3, padx=10, pady=10)
@@ -350,137 +553,208 @@ class UserDashboard:
         self.balance_amt.insert(0, f"{balance:.2f}")
         self.balance_amt.config(state="readonly")
 
+    @metrics.timed("ui:insert_data")
     def insert_data(self):
+        name = self.name_entry.get()
+        phone_no = self.phone_entry.get()
+        bill_no = self.transaction.get()
+        order_date = self.date_entry.get()
+        dob = self.dob_entry.get()
+        frame = self.frame_combobox.get()
+        frame_type = self.type_combobox.get()
+        lens = self.lens_entry.get()
+        unique_no = self.uniqueno_add.get()
+        remark=self.remark.get()
+        total_amount = self.parse_float(self.total_amt.get())
+        discount_amount = self.parse_float(self.discount.get())
+        advance_amount = self.parse_float(self.advance_amt.get())
+        balance_amount = self.parse_float(self.balance_amt.get())
+        payment_status = 'Paid' if balance_amount == 0 else 'Not Paid'
+
+        distance = [self.parse_float(entry.get()) for entry in self.entries[0]]
+        reading = [self.parse_float(entry.get()) for entry in self.entries[1]]
+
+        if not (name and phone_no and bill_no and frame and frame_type and lens and unique_no and total_amount):
+            messagebox.showerror("Error", "All fields must be filled!")
+            return
+
+        if not (phone_no.isdigit() and len(phone_no)==10):
+            messagebox.showerror("Invalid Phone Number", "Please enter a valid 10-digit phone number!")
+            return
+
+        if not remark:
+            messagebox.showerror("Put Remark", "Please enter a Remark")
+            return
+
+        payable_amount = total_amount - discount_amount
+        balance_amount = payable_amount - advance_amount
+        if total_amount < 0 or discount_amount < 0 or advance_amount < 0:
+            messagebox.showerror("Invalid Input", "Amounts cannot be negative.")
+            return
+
+        if discount_amount > total_amount:
+            messagebox.showerror("Invalid Discount", "Discount cannot exceed total amount.")
+            return
+
+        if advance_amount > payable_amount:
+            messagebox.showerror("Invalid Advance", "Advance exceeds payable amount.")
+            return
+
+        customer = (name, phone_no, bill_no, order_date, dob, frame, frame_type, total_amount, discount_amount,
+                    advance_amount, balance_amount, lens, payment_status, remark)
+        order = (customer, distance, reading, unique_no)
+        # Claim the frame first so a sold-out Frame/Type is refused before the order is saved
+        self.insert_button.config(state="disabled")
+        self.db.submit(reserve_stock, frame, frame_type, callback=lambda _: self._journal_order(order, True),
+                       errback=lambda e: self._reserve_failed(order, e))
+
+    def _journal_order(self, order, reserved):
+        self.insert_button.config(state="normal")
+        customer, distance, reading, unique_no = order
+        frame, frame_type = customer[5], customer[6]
         try:
-            conn=get_connection()
-            cursor=conn.cursor()
-            name = self.name_entry.get()
-            phone_no = self.phone_entry.get()
-            bill_no = self.transaction.get()
-            order_date = self.date_entry.get()
-            dob = self.dob_entry.get()
-            frame = self.frame_combobox.get()
-            frame_type = self.type_combobox.get()
-            lens = self.lens_entry.get()
-            unique_no = self.uniqueno_add.get()
-            remark=self.remark.get()
-            total_amount = self.parse_float(self.total_amt.get())
-            discount_amount = self.parse_float(self.discount.get())
-            advance_amount = self.parse_float(self.advance_amt.get())
-            balance_amount = self.parse_float(self.balance_amt.get())
-            payment_status = 'Paid' if balance_amount == 0 else 'Not Paid'
-            def parse_float(value):
-                try:
-                    return float(value) if value else 0
-                except ValueError:
-                    return 0
-
-            re_sph_dist = parse_float(self.entries[0][0].get())
-            re_cyl_dist = parse_float(self.entries[0][1].get())
-            re_axis_dist = parse_float(self.entries[0][2].get())
-            le_sph_dist = parse_float(self.entries[0][3].get())
-            le_cyl_dist = parse_float(self.entries[0][4].get())
-            le_axis_dist = parse_float(self.entries[0][5].get())
-
-            re_sph_read = parse_float(self.entries[1][0].get())
-            re_cyl_read = parse_float(self.entries[1][1].get())
-            re_axis_read = parse_float(self.entries[1][2].get())
-            le_sph_read = parse_float(self.entries[1][3].get())
-            le_cyl_read = parse_float(self.entries[1][4].get())
-            le_axis_read = parse_float(self.entries[1][5].get())
-            
-            if not (name and phone_no and bill_no and frame and frame_type and lens and unique_no and total_amount):
-                messagebox.showerror("Error", "All fields must be filled!")
-                return
-            
-            if not (phone_no.isdigit() and len(phone_no)==10):
-                messagebox.showerror("Invalid Phone Number", "Please enter a valid 10-digit phone number!")
-                return
-            
-            if not remark:
-                messagebox.showerror("Put Remark", "Please enter a Remark")
-                return
-
-            payable_amount = total_amount - discount_amount
-            balance_amount = payable_amount - advance_amount
-            if total_amount < 0 or discount_amount < 0 or advance_amount < 0:
-                messagebox.showerror("Invalid Input", "Amounts cannot be negative.")
-                return
-            
-            if discount_amount > total_amount:
-                messagebox.showerror("Invalid Discount", "Discount cannot exceed total amount.")
-                return
-
-            if advance_amount > payable_amount:
-                messagebox.showerror("Invalid Advance", "Advance exceeds payable amount.")
-                return
-            
-            cursor.execute('''
-            INSERT INTO customers 
-            (name, phone_no, bill_no, order_date, dob, Frame, Type, total_amount, discount, advance_amount, balance_amount, Lens,payment,remark)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s)
-        ''', (name, phone_no, bill_no, order_date, dob, frame, frame_type, total_amount, discount_amount, advance_amount, balance_amount, lens, payment_status,remark))
-
-            customer_id = cursor.lastrowid  # Get inserted ID
-
-
-            cursor.execute('''
-            INSERT INTO eye_prescriptions 
-            (customer_id, eye_type, re_sph, re_cyl, re_axis, le_sph, le_cyl, le_axis)
-            VALUES (%s, 'Distance', %s, %s, %s, %s, %s, %s)
-        ''', (customer_id, re_sph_dist, re_cyl_dist, re_axis_dist, le_sph_dist, le_cyl_dist, le_axis_dist))
-
-            cursor.execute('''
-            INSERT INTO eye_prescriptions 
-            (customer_id, eye_type, re_sph, re_cyl, re_axis, le_sph, le_cyl, le_axis)
-            VALUES (%s, 'Reading', %s, %s, %s, %s, %s, %s)
-        ''', (customer_id, re_sph_read, re_cyl_read, re_axis_read, le_sph_read, le_cyl_read, le_axis_read))
-
-            cursor.execute('''
-            INSERT INTO Spectacles_no
-            (customer_id, Frame, Type, unique_no)
-            VALUES (%s, %s, %s, %s)
-        ''', (customer_id, frame, frame_type, unique_no))
-            
-            conn.commit()
-            messagebox.showinfo("Success", "Customer data inserted successfully.")
-            self.name_entry.delete(0, tk.END)
-            self.phone_entry.delete(0, tk.END)
-            self.transaction.delete(0, tk.END)
-            self.date_entry.delete(0, tk.END)
-            self.dob_entry.delete(0, tk.END)
-            self.lens_entry.delete(0, tk.END)
-            self.uniqueno_add.delete(0, tk.END)
-            self.total_amt.delete(0, tk.END)
-            self.discount.delete(0, tk.END)
-            self.advance_amt.delete(0, tk.END)
-            self.balance_amt.delete(0, tk.END)
-            self.frame_combobox.set('')
-            self.type_combobox.set('')
-            self.remark.delete(0,tk.END)
-            for row in self.entries:
-                for entry in row:
-                    entry.delete(0, tk.END)
-            self.refresh_data()
-        except ValueError as ve:
-            messagebox.showerror("Invalid Input",f"{ve}")
-        except IntegrityError as ie:
-            messagebox.showerror("Database Error", f"Duplicate or invalid entry: {ie}")
-        except InterfaceError:
-            messagebox.showerror("Connection Error", "Could not connect to the database. Please check your settings.")
-        except Error as db_err:
-            messagebox.showerror("Database Error", f"An error occurred while accessing the database:\n{db_err}")
-        except Exception as e:
-            messagebox.showerror("Unexpected Error", f"Something went wrong:\n{e}")
-        finally:
-            try:
-                if conn.is_connected():
-                    cursor.close()
-                    conn.close()
-            except:
-                pass
+            self.journal.append(customer, distance, reading, unique_no, reserved)
+        except DuplicateOrder as e:
+            if reserved:
+                self.return_stock(frame, frame_type)
+            messagebox.showerror("Duplicate Order", str(e))
+            return
+        # The order is safe on this PC; the background flush writes it to the database
+        messagebox.showinfo("Success", "Customer data inserted successfully.")
+        self.clear_order_form()
+        count = self.catalogue.count(frame, frame_type)
+        self.apply_stock_count(frame, frame_type, count - 1 if count else count)
+        self.flush_journal()
+
+    def return_stock(self, frame, frame_type, attempt=0):
+        # Gives back a unit claimed for an order that was not saved; retried until it is stored
+        self.db.submit(release_stock, frame, frame_type,
+                       errback=lambda e: self._return_stock_failed(frame, frame_type, attempt, e))
+
+    def _return_stock_failed(self, frame, frame_type, attempt, e):
+        if attempt == 0:
+            messagebox.showwarning("Stock Not Returned", f"Could not give back the {frame} {frame_type} claimed for "
+                                                         f"the unsaved order ({e}). Retrying in the background.")
+        self.master.after(JOURNAL_RETRY_MS, lambda: self.return_stock(frame, frame_type, attempt + 1))
+
+    def _reserve_failed(self, order, e):
+        customer = order[0]
+        if isinstance(e, UNREACHABLE):
+            # Journal it anyway; the flush claims the stock when the server is back
+            self._journal_order(order, False)
+            return
+        self.insert_button.config(state="normal")
+        if isinstance(e, OutOfStock):
+            self.catalogue.set_count(customer[5], customer[6], 0)
+            self._catalogue_refreshed(True)
+            messagebox.showerror("Out of Stock", f"{e} Please choose another frame.")
+        else:
+            messagebox.showerror("Database Error", f"Error checking stock: {e}")
+
+    def clear_order_form(self):
+        self.name_entry.delete(0, tk.END)
+        self.phone_entry.delete(0, tk.END)
+        self.transaction.delete(0, tk.END)
+        self.date_entry.delete(0, tk.END)
+        self.dob_entry.delete(0, tk.END)
+        self.lens_entry.delete(0, tk.END)
+        self.uniqueno_add.delete(0, tk.END)
+        self.total_amt.delete(0, tk.END)
+        self.discount.delete(0, tk.END)
+        self.advance_amt.delete(0, tk.END)
+        self.balance_amt.delete(0, tk.END)
+        self.frame_combobox.set('')
+        self.type_combobox.set('')
+        self.remark.delete(0,tk.END)
+        for row in self.entries:
+            for entry in row:
+                entry.delete(0, tk.END)
+
+    def apply_stock_count(self, frame, frame_type, count):
+        # Patch the catalogue with the count returned by the order instead of reloading it
+        if count is not None:
+            self.catalogue.set_count(frame, frame_type, count)
+        self.frame_combobox["values"] = self.get_options("Frame")
+        self.frame_combobox.set("Select Frame")
+        self.type_combobox.set("Select Type")
+        self.type_combobox["values"] = []
+
+    def flush_journal(self):
+        if self.journal_job is not None:
+            self.master.after_cancel(self.journal_job)
+            self.journal_job = None
+        self.db.submit(self.journal.flush, callback=self._journal_flushed, errback=self._journal_flush_failed)
+
+    def _journal_flush_failed(self, e):
+        # An unreachable server is expected offline; the entries stay pending and say so
+        if not isinstance(e, UNREACHABLE):
+            messagebox.showerror("Database Error", f"Error sending saved orders: {e}")
+        self.show_journal()
+
+    def _journal_flushed(self, sent):
+        for order in sent:
+            customer = order.customer
+            self.search_index.add_order(order.customer_id, customer[0], customer[1], customer[2], order.unique_no)
+            if order.stock_left is not None:
+                self.catalogue.set_count(customer[5], customer[6], order.stock_left)
+        if sent:
+            self._catalogue_refreshed(True)
+            if self.broadcast:
+                self.broadcast.publish("customers", "stocks")
+        self.show_journal()
+
+    def order_sync_tab(self):
+        tab = self.tab4
+        self.journal_summary = tk.Label(tab, text="", font=("Arial", 12))
+        self.journal_summary.pack(anchor="w", padx=10, pady=5)
+        columns = ("Bill No", "Name", "Saved", "Status", "Attempts", "Last Error")
+        self.journal_tree = ttk.Treeview(tab, columns=columns, show="headings", height=15)
+        for col in columns:
+            self.journal_tree.heading(col, text=col)
+            self.journal_tree.column(col, width=400 if col == "Last Error" else 120, anchor="w")
+        self.journal_tree.pack(fill="both", expand=True, padx=10, pady=5)
+        buttons = tk.Frame(tab)
+        buttons.pack(anchor="w", padx=10, pady=5)
+        tk.Button(buttons, text="Send Now", font=("Arial", 12), command=self.flush_journal).pack(side="left", padx=5)
+        tk.Button(buttons, text="Retry Selected", font=("Arial", 12), command=self.retry_journal).pack(side="left", padx=5)
+        tk.Button(buttons, text="Remove Selected", font=("Arial", 12), command=self.remove_journal).pack(side="left", padx=5)
+
+    def show_journal(self):
+        # Orders not yet on the server: pending ones are retried, failed ones need the counter
+        entries = self.journal.entries()
+        self.journal_tree.delete(*self.journal_tree.get_children())
+        for entry in entries:
+            self.journal_tree.insert("", "end", iid=str(entry.id), values=(
+                entry.bill_no, entry.name, entry.created, entry.status, entry.attempts, entry.error or ""))
+        pending = sum(entry.status == "pending" for entry in entries)
+        failed = len(entries) - pending
+        self.journal_summary.config(text=f"{pending} orders waiting to be sent, {failed} rejected by the database",
+                                    fg="red" if failed else "black")
+        self.notebook.tab(self.tab4, text=f"Order Sync ({len(entries)})" if entries else "Order Sync")
+        if pending and self.journal_job is None:
+            self.journal_job = self.master.after(JOURNAL_RETRY_MS, self.flush_journal)
+
+    def retry_journal(self):
+        selected = [int(iid) for iid in self.journal_tree.selection()]
+        if not selected:
+            messagebox.showerror("Selection Error", "Please select the orders to send again.")
+            return
+        self.journal.retry(selected)
+        self.flush_journal()
+
+    def remove_journal(self):
+        selected = [int(iid) for iid in self.journal_tree.selection()]
+        if not selected:
+            messagebox.showerror("Selection Error", "Please select the orders to remove.")
+            return
+        if messagebox.askyesno("Remove Orders", f"Remove {len(selected)} rejected orders? They will not be saved to the database."):
+            self.journal.remove(selected)
+            self.show_journal()
 
     def logout(self):
+        self.db.shutdown()
+        if self.broadcast:
+            self.broadcast.stop()
         self.master.destroy()
         gc.collect()
         import login
@@ -0,0 +1,140 @@
+import argparse
+import csv
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from db_config import get_connection
+from repository import repo, STATEMENTS
+
+# Streams customers, their eye prescriptions and spectacles numbers to one file each
+# (CSV or JSON Lines). Rows are read in id order from an unbuffered cursor in chunks, so
+# memory use does not depend on the number of rows. After every chunk the last exported id
+# and the file size are saved in export_state.json; an interrupted export started again with
+# the same options truncates each file to its last saved size and continues after that id
+# (a file that is gone or shorter than that is exported again from the start).
+# Every dataset only covers customers up to the highest id at the start of the export, so
+# prescriptions and spectacles numbers of orders placed meanwhile do not appear without
+# their customer row.
+
+EXPORT_DATASETS = [
+    ("customers", "export_customers"),
+    ("eye_prescriptions", "export_prescriptions"),
+    ("spectacles_no", "export_spectacles"),
+]
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_CHUNK = 1000
+STATE_FILE = "export_state.json"
+ALL_DATES = (date(1000, 1, 1), date(9999, 12, 31))
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)    # keeps the exact amount
+    return value
+
+
+class ExportWriter:
+    def __init__(self, path, fmt, fields, offset):
+        self.fmt = fmt
+        self.fields = fields
+        if offset:
+            # Drop anything written after the last saved chunk
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+        self.file = open(path, "a" if offset else "w", newline="", encoding="utf-8")
+        self.csv = csv.writer(self.file) if fmt == "csv" else None
+        if self.csv and not offset:
+            self.csv.writerow(fields)
+
+    def write(self, rows):
+        if self.csv:
+            self.csv.writerows(tuple(row) for row in rows)
+        else:
+            for row in rows:
+                self.file.write(json.dumps({f: _json_value(v) for f, v in zip(self.fields, row)}) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _load_state(path, options):
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get("options") == options else None
+
+
+def _save_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def export_data(out_dir, fmt="csv", start=None, end=None, fresh=False, progress=None):
+    # Returns {dataset: rows written by this run}; `progress(dataset, rows)` is called per chunk
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    start, end = start or ALL_DATES[0], end or ALL_DATES[1]
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, STATE_FILE)
+    options = {"format": fmt, "start": start.isoformat(), "end": end.isoformat()}
+    state = None if fresh else _load_state(state_path, options)
+    # Only an interrupted export is continued; a finished one is written again
+    if state is None or "max_customer_id" not in state or all(d["done"] for d in state["datasets"].values()):
+        state = {"options": options, "max_customer_id": repo.query_one("customers_watermark").max_id or 0, "datasets": {}}
+
+    written = {}
+    for dataset, statement in EXPORT_DATASETS:
+        progress_state = state["datasets"].setdefault(dataset, {"last_id": 0, "offset": 0, "done": False})
+        written[dataset] = 0
+        if progress_state["done"]:
+            continue
+        record = STATEMENTS[statement].record
+        path = os.path.join(out_dir, f"{dataset}.{fmt}")
+        if progress_state["offset"] and (not os.path.exists(path) or os.path.getsize(path) < progress_state["offset"]):
+            progress_state.update(last_id=0, offset=0)
+        writer = ExportWriter(path, fmt, record.__slots__, progress_state["offset"])
+        try:
+            with get_connection() as conn:
+                params = (progress_state["last_id"], state["max_customer_id"], start, end)
+                for rows in repo.stream(statement, params, conn, EXPORT_CHUNK):
+                    progress_state["offset"] = writer.write(rows)
+                    progress_state["last_id"] = rows[-1].id
+                    _save_state(state_path, state)
+                    written[dataset] += len(rows)
+                    if progress:
+                        progress(dataset, written[dataset])
+        finally:
+            writer.close()
+        progress_state["done"] = True
+        _save_state(state_path, state)
+    return written
+
+
+def _parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export customers, prescriptions and spectacles numbers")
+    parser.add_argument("out_dir")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--from", dest="start", type=_parse_date, help="first order date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=_parse_date, help="last order date, YYYY-MM-DD")
+    parser.add_argument("--fresh", action="store_true", help="ignore a previous interrupted export")
+    args = parser.parse_args()
+    counts = export_data(args.out_dir, args.format, args.start, args.end, args.fresh,
+                         progress=lambda dataset, rows: print(f"\r{dataset}: {rows} rows", end="", flush=True))
+    print()
+    for dataset, rows in counts.items():
+        print(f"{dataset}: {rows} rows written")
@@ -1,4 +1,15 @@
-import mysql.connector
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from instrumentation import metrics
+
+# 'mysql' talks to the shop server in DB_CONFIG. 'sqlite' keeps the whole database in one
+# local file (SQLITE_CONFIG) for shops with a single counter PC: no server to install and
+# no network round trip per query. OMKAR_DB_BACKEND overrides it for one run (the tests use 'sqlite').
+DB_BACKEND = os.environ.get('OMKAR_DB_BACKEND', 'mysql')
 
 DB_CONFIG = {
     'host': 'localhost',
@@ -8,5 +19,173 @@ DB_CONFIG = {
     'port': 3360
 }
 
+SQLITE_CONFIG = {
+    'database': os.path.join(os.path.expanduser("~"), "omkar_optics.db"),
+    # Bundled next to the modules; in the packaged exe that is the unpack directory (login.spec)
+    'schema': os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), "OmkarOptic.sqlite.sql"),
+    'timeout': 5            # seconds a write waits for another writer to commit
+}
+
+POOL_CONFIG = {
+    'max_size': 5,          # connections kept open at most
+    'idle_check': 30,       # seconds idle before a connection is pinged on checkout
+    'checkout_timeout': 10  # seconds to wait for a free connection
+}
+
+CHANGE_FEED_CONFIG = {
+    'enabled': True,
+    'host': 'localhost',    # machine running `python change_feed.py serve`
+    'port': 8765,
+    'retry': 5              # seconds between reconnect attempts
+}
+
+if DB_BACKEND == 'sqlite':
+    from sqlite_backend import connect, Error, IntegrityError, InterfaceError, OperationalError
+    BACKEND_CONFIG = SQLITE_CONFIG
+else:
+    import mysql.connector
+    from mysql.connector import Error, IntegrityError, InterfaceError, OperationalError
+    connect = mysql.connector.connect
+    BACKEND_CONFIG = DB_CONFIG
+
+
+class PoolExhausted(Error):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, config, connect, max_size=5, idle_check=30, checkout_timeout=10):
+        self.config = config
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_check = idle_check
+        self.checkout_timeout = checkout_timeout
+        self._idle = []        # (connection, last_used) pairs, most recent last
+        self._size = 0         # open connections, idle + checked out
+        self._cond = threading.Condition()
+        self.stats = {'checkouts': 0, 'waits': 0, 'misses': 0, 'reconnects': 0, 'discarded': 0}
+        self.reconnect_hooks = []   # called with the connection after it reconnects (session state is gone)
+
+    def _connect(self):
+        return self.connect(**self.config)
+
+    def _healthy(self, conn, last_used):
+        # Recently used connections are trusted; only idle ones pay for a ping
+        if time.monotonic() - last_used < self.idle_check:
+            return True
+        try:
+            conn.ping()
+            return True
+        except Error:
+            pass
+        # Stale (server timeout, network blip): reconnect the same handle once
+        try:
+            conn.reconnect(attempts=1)
+            self.stats['reconnects'] += 1
+            for hook in self.reconnect_hooks:
+                hook(conn)
+            return True
+        except Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            self.stats['checkouts'] += 1
+        waited = False
+        while True:
+            with self._cond:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    self.stats['misses'] += 1
+                    conn = None
+                else:
+                    if not waited:
+                        self.stats['waits'] += 1
+                        waited = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        raise PoolExhausted("No database connection available, please try again.")
+                    continue
+
+            # Health checks and new connections run outside the lock so other checkouts are not held up
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot(discarded=False)
+                    raise
+            if self._healthy(conn, last_used):
+                return conn
+            self._discard(conn)
+            self._release_slot()
+
+    def _release_slot(self, discarded=True):
+        with self._cond:
+            self._size -= 1
+            if discarded:
+                self.stats['discarded'] += 1
+            self._cond.notify()
+
+    def checkin(self, conn, suspect=False):
+        # Connections returned after an error are pinged; clean returns skip the round trip
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = conn.is_connected() if suspect else True
+        except Error:
+            healthy = False
+
+        if not healthy:
+            self._discard(conn)
+            self._release_slot()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def warm(self, count=1):
+        # Open connections ahead of the first checkout, e.g. behind the splash screen
+        conns = [self.checkout() for _ in range(min(count, self.max_size))]
+        for conn in conns:
+            self.checkin(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, size=self._size, idle=len(self._idle))
+
+
+pool = ConnectionPool(BACKEND_CONFIG, connect, **POOL_CONFIG)
+
+
+@contextmanager
 def get_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+    started = time.perf_counter()
+    conn = pool.checkout()
+    # Waiting for a free connection shows up next to the statements it delayed
+    metrics.record_query("pool.checkout", (time.perf_counter() - started) * 1000)
+    try:
+        yield conn
+    except BaseException:
+        pool.checkin(conn, suspect=True)
+        raise
+    pool.checkin(conn)
+
+
+def pool_stats():
+    return pool.snapshot()
@@ -0,0 +1,107 @@
+import queue
+import sys
+import time
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import metrics
+
+
+class QueryExecutor:
+    # Runs database work on background threads and hands results back on the Tk thread.
+    # Worker functions must not touch widgets; read inputs before submitting and
+    # update the UI from the callback.
+    def __init__(self, master, workers=2, poll_ms=50, on_busy=None):
+        self.master = master
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-worker")
+        self._results = queue.Queue()
+        self._latest = {}      # key -> id of the newest job submitted under that key
+        self._futures = {}     # job id -> Future, for cancelling superseded jobs
+        self._next_id = 0
+        self._pending = 0
+        self._closed = False
+        self._poll()
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, fn, *args, callback=None, errback=None, key=None):
+        if self._closed:
+            return None
+        self._next_id += 1
+        job_id = self._next_id
+        if key is not None:
+            self.cancel(key)
+            self._latest[key] = job_id
+
+        label = f"job:{key or getattr(fn, '__name__', 'call')}"
+        submitted = time.perf_counter()
+
+        def run():
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self._results.put((job_id, key, errback, e, False, label, submitted))
+            else:
+                self._results.put((job_id, key, callback, result, True, label, submitted))
+
+        self._set_pending(self._pending + 1)
+        self._futures[job_id] = self._pool.submit(run)
+        return job_id
+
+    def cancel(self, key):
+        # Superseded jobs that have not started are dropped; running ones finish
+        # but their results are discarded when they reach the Tk thread.
+        job_id = self._latest.pop(key, None)
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            del self._futures[job_id]
+            self._set_pending(self._pending - 1)
+
+    def _poll(self):
+        if self._closed:
+            return
+        try:
+            while True:
+                try:
+                    job_id, key, handler, value, ok, label, submitted = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                self._futures.pop(job_id, None)
+                self._set_pending(self._pending - 1)
+                if key is not None:
+                    if self._latest.get(key) != job_id:
+                        continue
+                    del self._latest[key]
+                try:
+                    if handler is not None:
+                        handler(value)
+                    elif not ok:
+                        print(f"Background query failed: {value}")
+                except Exception:
+                    # A failing callback is reported like any Tk callback error; later results still arrive
+                    self.master.report_callback_exception(*sys.exc_info())
+                # From submit until the result is on screen, including time queued behind other jobs
+                metrics.record_ui(label, (time.perf_counter() - submitted) * 1000)
+        finally:
+            try:
+                self.master.after(self.poll_ms, self._poll)
+            except tk.TclError:
+                # Window already destroyed
+                self.shutdown()
+
+    def _set_pending(self, count):
+        was_busy = self.busy
+        self._pending = count
+        if self.on_busy and was_busy != self.busy:
+            try:
+                self.on_busy(self.busy)
+            except tk.TclError:
+                pass
+
+    def shutdown(self):
+        self._closed = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
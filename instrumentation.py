@@ -0,0 +1,146 @@
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SLOW_QUERY_MS = 200
+SLOW_LOG_PATH = os.path.join(os.path.expanduser("~"), "omkar_optics_slow_queries.log")
+METRICS_PATH = os.path.join(os.path.expanduser("~"), "omkar_optics_metrics.json")
+DUMP_EVERY = 60     # seconds between JSON dumps
+
+
+class Histogram:
+    # Fixed millisecond buckets; percentiles are reported as the upper bound of their bucket
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.errors = 0
+
+    def add(self, ms, rows=0, failed=False):
+        self.buckets[bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.errors += failed
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows
+
+    def percentile(self, fraction):
+        target = self.count * fraction
+        seen = 0
+        for bound, n in zip(HISTOGRAM_BOUNDS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            'calls': self.count,
+            'rows': self.rows,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': dict(zip([f"<={b}" for b in HISTOGRAM_BOUNDS_MS] + ["more"], self.buckets)),
+        }
+
+
+class Metrics:
+    # Process-wide latency figures: every repository statement (and pool checkout waits) under
+    # `queries`, Tk callbacks and background jobs as the counter staff feel them under `ui`.
+    # Statements slower than SLOW_QUERY_MS are appended to SLOW_LOG_PATH. Failed statements
+    # count too (a lock wait timeout is the slowest statement there is), marked with their error.
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=SLOW_LOG_PATH):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.started = time.time()
+        self._queries = {}
+        self._ui = {}
+        self._lock = threading.Lock()
+        self._dumper = None
+
+    def record_query(self, name, ms, rows=0, sql=None, error=None):
+        # `error` is the exception class name of a failed statement
+        with self._lock:
+            self._queries.setdefault(name, Histogram()).add(ms, rows, error is not None)
+        if ms >= self.slow_ms:
+            self._log_slow(name, ms, rows, sql, error)
+
+    def record_ui(self, name, ms):
+        with self._lock:
+            self._ui.setdefault(name, Histogram()).add(ms)
+
+    def _log_slow(self, name, ms, rows, sql, error=None):
+        # Parameters are left out on purpose: they include customer details and password hashes
+        statement = " ".join((sql or "").split())[:300]
+        outcome = f"FAILED {error}" if error else f"{rows} rows"
+        line = f"{datetime.now().isoformat(timespec='milliseconds')}\t{ms:.1f} ms\t{outcome}\t{name}\t{statement}\n"
+        try:
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Could not write slow query log: {e}")
+
+    @contextmanager
+    def ui_timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_ui(name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, name):
+        # Decorator for Tk callbacks: time spent blocking the event loop
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.ui_timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        from db_config import pool_stats
+        with self._lock:
+            queries = {name: h.snapshot() for name, h in self._queries.items()}
+            ui = {name: h.snapshot() for name, h in self._ui.items()}
+        return {
+            'written': datetime.now().isoformat(timespec="seconds"),
+            'uptime_s': round(time.time() - self.started),
+            'queries': queries,
+            'ui': ui,
+            'pool': pool_stats(),
+        }
+
+    def dump(self, path=METRICS_PATH):
+        try:
+            with open(path, "w") as f:
+                json.dump(self.snapshot(), f, indent=2)
+        except OSError as e:
+            print(f"Could not write metrics: {e}")
+
+    def start_dumping(self, every=DUMP_EVERY, path=METRICS_PATH):
+        # Daemon thread, so it lives across the login and dashboard windows and dies with the process
+        if self._dumper is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(every)
+                self.dump(path)
+
+        self._dumper = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+        self._dumper.start()
+
+
+metrics = Metrics()
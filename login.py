@@ -1,15 +1,15 @@
+from startup import timer, preloaded, base_dir, run_preload, PRELOAD_TASKS, BACKGROUND_SIZE
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 from PIL import Image, ImageTk
 import os
-import sys
-import time
-from db_config import get_connection
-from utils import verify_password
-from dashboard import open_user_dashboard
-from admin_dashboard import open_admin_dashboard
-from mysql.connector import Error
+import threading
+from db_config import get_connection, Error
+from repository import repo
+from utils import verify_password, needs_rehash, hash_password, REHASH_ON_LOGIN
+from db_worker import QueryExecutor
+from instrumentation import metrics
 
 
 class LoginApp:
@@ -18,6 +18,7 @@ class LoginApp:
         self.root.title("Omkar Optics Login Page")
         self.root.configure(bg="white")
         self.root.resizable(False, False)
+        self.auth = QueryExecutor(self.root, workers=1)
 
         self.setup_ui()
 
@@ -34,11 +35,10 @@ class LoginApp:
         self.password_entry = None
 
     def setup_ui(self):
-        # Load background
-        base_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-        img_path = os.path.join(base_dir, "Bg1.png")
+        # Load background, already decoded behind the splash screen on a normal start
+        img_path = os.path.join(base_dir(), "Bg1.png")
         try:
-            img = Image.open(img_path).resize((500, 500), Image.Resampling.LANCZOS)
+            img = preloaded.get('background') or Image.open(img_path).resize(BACKGROUND_SIZE, Image.Resampling.LANCZOS)
             self.bg_img = ImageTk.PhotoImage(img)
             tk.Label(self.root, image=self.bg_img).grid(row=0, column=0)
         except Exception as e:
@@ -67,14 +67,19 @@ class LoginApp:
         self.toggle_btn.grid(row=4, column=1, sticky='w', pady=5)
 
         # Login Button
-        tk.Button(frame, text="Login", font=("", 16, "bold"), height=1, width=10, bg="#0085FF", fg="white",
-                  cursor="hand2", command=self.login_user).grid(row=5, column=0, sticky="ne", pady=20, padx=35)
+        self.login_btn = tk.Button(frame, text="Login", font=("", 16, "bold"), height=1, width=10, bg="#0085FF", fg="white",
+                                   cursor="hand2", command=self.login_user)
+        self.login_btn.grid(row=5, column=0, sticky="ne", pady=20, padx=35)
+
+        # Shown while credentials are being checked
+        self.progress = ttk.Progressbar(frame, mode="indeterminate")
 
     def toggle_password(self):
         show = self.password_entry.cget('show') == ''
         self.password_entry.config(show='*' if show else '')
         self.toggle_btn.config(text='Show' if show else 'Hide')
 
+    @metrics.timed("ui:login_user")
     def login_user(self):
         username = self.username_entry.get().strip()
         password = self.password_entry.get().strip()
@@ -83,39 +88,78 @@ class LoginApp:
             messagebox.showerror("Error", "Username and password cannot be empty")
             return
 
-        try:
-            conn = get_connection()
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT password, type FROM users WHERE username = %s", (username,))
-                user = cursor.fetchone()
-
-            if user and verify_password(password, user[0]):
-                messagebox.showinfo("Success", "Login successful. Redirecting...")
-                self.root.destroy()
-                del username,password
-                if user[1] == "admin":
-                    del user
-                    open_admin_dashboard()
-                else:
-                    del user
-                    open_user_dashboard()
-            else:
-                messagebox.showerror("Error", "Invalid username or password")
-        except Error as e:
+        # bcrypt takes a noticeable fraction of a second, so it runs off the Tk thread
+        self.login_btn.config(state="disabled")
+        self.progress.grid(row=6, column=0, sticky="we", padx=30)
+        self.progress.start(10)
+        self.auth.submit(authenticate, username, password, callback=self.login_finished,
+                         errback=self.login_failed, key="login")
+        del username,password
+
+    def _stop_progress(self):
+        self.progress.stop()
+        self.progress.grid_remove()
+        self.login_btn.config(state="normal")
+
+    def login_failed(self, e):
+        self._stop_progress()
+        if isinstance(e, Error):
             messagebox.showerror("Database Error", f"Error: {str(e)}")
-        finally:
-            if 'conn' in locals() and conn.is_connected():
-                conn.close()
+        else:
+            messagebox.showerror("Error", f"Login failed: {e}")
+
+    def login_finished(self, role):
+        self._stop_progress()
+        if role is None:
+            messagebox.showerror("Error", "Invalid username or password")
+            return
+
+        messagebox.showinfo("Success", "Login successful. Redirecting...")
+        self.auth.shutdown()
+        self.root.destroy()
+        # Dashboards pull in matplotlib/tkcalendar, so only the one for this role is imported
+        if role == "admin":
+            with timer.phase("import_admin_dashboard"):
+                from admin_dashboard import open_admin_dashboard
+            timer.save()
+            open_admin_dashboard()
+        else:
+            with timer.phase("import_user_dashboard"):
+                from dashboard import open_user_dashboard
+            timer.save()
+            open_user_dashboard()
+
+
+def authenticate(username, password):
+    # Runs on the login worker; returns the user's type, or None for bad credentials
+    with get_connection() as conn:
+        user = repo.query_one("user_login", (username,), conn)
+        if user is None or not verify_password(password, user.password):
+            return None
+
+        # Move stored hashes to the configured cost while the plain password is at hand
+        if REHASH_ON_LOGIN and needs_rehash(user.password):
+            try:
+                repo.execute("update_password", (hash_password(password), user.id), conn)
+                conn.commit()
+            except Error as e:
+                print(f"Password rehash failed for user {user.id}: {e}")
+    return user.type
 
 
 def launch_login():
-    root = tk.Tk()
-    app = LoginApp(root)
+    with timer.phase("login_window"):
+        root = tk.Tk()
+        app = LoginApp(root)
+        root.update_idletasks()
+    timer.save()
     root.mainloop()
 
 
 # Splash screen with progress bar
 def show_splash_and_launch_login():
+    timer.mark("imports")
+    metrics.start_dumping()
     splash_root = tk.Tk()
     splash_root.overrideredirect(True)
 
@@ -132,15 +176,20 @@ def show_splash_and_launch_login():
     progress = ttk.Progressbar(splash_root, orient="horizontal", length=300, mode="determinate")
     progress.pack(pady=10)
 
-    def load():
-        for i in range(0, 101, 5):
-            progress['value'] = i
-            splash_root.update_idletasks()
-            time.sleep(0.05)
+    # Progress follows the preload tasks running on a background thread
+    done = []
+    worker = threading.Thread(target=run_preload, args=(done,), daemon=True)
+
+    def poll():
+        progress['value'] = len(done) * 100 / len(PRELOAD_TASKS)
+        if worker.is_alive():
+            splash_root.after(30, poll)
+            return
         splash_root.destroy()
         launch_login()
 
-    splash_root.after(100, load)
+    worker.start()
+    splash_root.after(30, poll)
     splash_root.mainloop()
 
 
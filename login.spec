@@ -5,7 +5,7 @@ a = Analysis(
     ['login.py'],
     pathex=[],
     binaries=[],
-    datas=[('Bg1.png', '.')],
+    datas=[('Bg1.png', '.'), ('OmkarOptic.sqlite.sql', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from db_config import Error, InterfaceError, OperationalError, PoolExhausted
+from repository import repo, record
+
+# Orders are saved to a journal on the counter PC first and sent to the shop database by a
+# background flush, so a slow or unreachable server never costs the counter a typed-in order.
+#  * append() commits the order to a local SQLite file (synchronous=FULL, so it survives a
+#    power cut) before the counter is told it is saved
+#  * flush() sends pending entries oldest first, each with one CALL place_order. When the
+#    server cannot be reached the entries stay pending and the next flush retries them; an
+#    order the server rejects (duplicate bill number, out of stock) is marked failed and left
+#    for the counter to look at in the Order Sync tab
+#  * an entry whose bill number is already on the server with the same spectacles number was
+#    sent before the journal could record it, and is only marked sent
+# Stock is claimed with reserve_stock() before the order is journalled, so the counter gets
+# its out-of-stock answer while the customer is still there. An order journalled while the
+# server was unreachable has its unit claimed by place_order, with its own single-statement
+# commit before the order transaction opens. A claimed order the server later rejects gives
+# its unit back.
+
+JOURNAL_PATH = os.path.join(os.path.expanduser("~"), "omkar_optics_orders.db")
+FLUSH_BATCH = 20        # journal entries read per step of a flush
+KEEP_SENT_DAYS = 30     # sent entries are pruned after this long
+# Errors that say nothing about the order itself: keep it pending and try again later
+UNREACHABLE = (InterfaceError, OperationalError, PoolExhausted)
+
+JournalEntry = record("JournalEntry", "id", "created", "bill_no", "unique_no", "name", "status", "attempts", "error")
+SentOrder = record("SentOrder", "customer_id", "customer", "unique_no", "stock_left")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  created TEXT NOT NULL,
+  bill_no TEXT NOT NULL UNIQUE,
+  unique_no TEXT NOT NULL UNIQUE,
+  name TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'pending',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  error TEXT,
+  sent TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (status, id);
+"""
+
+
+class DuplicateOrder(Exception):
+    pass
+
+
+class OutOfStock(Exception):
+    pass
+
+
+def reserve_stock(frame, frame_type):
+    # The check and the decrement are one UPDATE committed on its own, so the row is locked for
+    # that statement only; no row matched means nothing is left to sell
+    if repo.execute("reserve_stock", (frame, frame_type))[0] == 0:
+        raise OutOfStock(f"{frame} {frame_type} is out of stock.")
+
+
+def release_stock(frame, frame_type):
+    repo.execute("release_stock", (frame, frame_type))
+
+
+class OrderJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = FULL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()        # the Tk thread appends while a worker flushes
+        self._flushing = threading.Lock()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def append(self, customer, distance, reading, unique_no, reserved=False):
+        # Tk thread; raises DuplicateOrder when the bill or spectacles number is already journalled.
+        # `reserved` says the unit of stock was already claimed with reserve_stock().
+        payload = json.dumps({'customer': list(customer), 'distance': list(distance),
+                              'reading': list(reading), 'unique_no': unique_no, 'reserved': reserved})
+        try:
+            self._execute("INSERT INTO orders (created, bill_no, unique_no, name, payload) VALUES (?, ?, ?, ?, ?)",
+                          (datetime.now().isoformat(" ", "seconds"), customer[2], unique_no, customer[0], payload))
+        except sqlite3.IntegrityError:
+            raise DuplicateOrder(f"Bill {customer[2]} or spectacles number {unique_no} was already saved.")
+
+    def entries(self, statuses=("pending", "failed")):
+        marks = ", ".join("?" * len(statuses))
+        rows = self._execute(f"SELECT id, created, bill_no, unique_no, name, status, attempts, error FROM orders "
+                             f"WHERE status IN ({marks}) ORDER BY id", statuses)
+        return [JournalEntry(*row) for row in rows]
+
+    def counts(self):
+        return dict(self._execute("SELECT status, COUNT(*) FROM orders GROUP BY status"))
+
+    def retry(self, entry_ids):
+        # Failed entries go back in the queue, e.g. after the stock was topped up
+        for entry_id in entry_ids:
+            self._execute("UPDATE orders SET status = 'pending', error = NULL WHERE id = ? AND status = 'failed'", (entry_id,))
+
+    def remove(self, entry_ids):
+        for entry_id in entry_ids:
+            self._execute("DELETE FROM orders WHERE id = ? AND status = 'failed'", (entry_id,))
+
+    def _mark(self, entry_id, status, error=None):
+        self._execute("UPDATE orders SET status = ?, attempts = attempts + 1, error = ?, "
+                      "sent = CASE WHEN ? = 'sent' THEN ? END WHERE id = ?",
+                      (status, error, status, datetime.now().isoformat(" ", "seconds"), entry_id))
+
+    def flush(self, batch_size=FLUSH_BATCH):
+        # Worker thread; returns the orders written to the server by this call. Only one flush
+        # runs at a time; a call made meanwhile returns straight away and the running one picks
+        # up anything appended before it reads its next batch.
+        if not self._flushing.acquire(blocking=False):
+            return []
+        sent = []
+        try:
+            after = 0
+            while True:
+                rows = self._execute("SELECT id, payload FROM orders WHERE status = 'pending' AND id > ? ORDER BY id LIMIT ?",
+                                     (after, batch_size))
+                if not rows:
+                    break
+                for entry_id, payload in rows:
+                    placed = self._send(entry_id, json.loads(payload))
+                    if placed is not None:
+                        sent.append(placed)
+                after = rows[-1][0]
+            cutoff = (datetime.now() - timedelta(days=KEEP_SENT_DAYS)).isoformat(" ", "seconds")
+            self._execute("DELETE FROM orders WHERE status = 'sent' AND sent < ?", (cutoff,))
+        finally:
+            self._flushing.release()
+        return sent
+
+    def _save_payload(self, entry_id, order):
+        self._execute("UPDATE orders SET payload = ? WHERE id = ?", (json.dumps(order), entry_id))
+
+    def _send(self, entry_id, order):
+        customer = order['customer']
+        reserved = order.get('reserved', False)
+        try:
+            placed = repo.query_one("place_order", (*customer, order['unique_no'], *order['distance'],
+                                                    *order['reading'], reserved))
+        except UNREACHABLE as e:
+            self._mark(entry_id, "pending", f"Waiting for the database: {e}")
+            raise
+        except Error as e:
+            if reserved:
+                # Give the claimed unit back; a retry claims it again when the order is sent
+                try:
+                    release_stock(customer[5], customer[6])
+                except UNREACHABLE as down:
+                    self._mark(entry_id, "pending", f"Waiting for the database: {down}")
+                    raise
+                except Error as down:
+                    # The unit is still claimed (reserved stays set), so say so next to the reason
+                    self._mark(entry_id, "failed", f"{getattr(e, 'msg', None) or e} "
+                                                   f"(the claimed stock could not be given back: {down})")
+                    return None
+                order['reserved'] = False
+                self._save_payload(entry_id, order)
+            self._mark(entry_id, "failed", getattr(e, "msg", None) or str(e))
+            return None
+        self._mark(entry_id, "sent")
+        return SentOrder(placed.customer_id, customer, order['unique_no'], placed.stock_left)
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from db_config import get_connection
+from repository import repo
+from sales_rollup import query_sales
+
+REPORT_KINDS = ("daily", "monthly")
+MAX_AGE = 600   # seconds before an entry is reloaded even if the watermark has not moved
+
+
+class ReportCache:
+    # Sales report aggregates keyed by (kind, start, end). Each entry remembers the customers
+    # watermark (MAX(id), MAX(updated_at)) it reflects. A repeat request costs one index-only
+    # watermark query; new orders since the watermark are folded into the cached totals and
+    # anything else (edited existing orders, old entries) triggers a full reload from the rollups.
+    # Deletes do not move the watermark; call invalidate() after deleting orders or stock.
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'folds': 0, 'loads': 0}
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, kind, start, end):
+        key = (kind, start, end)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry['loaded'] >= MAX_AGE:
+            entry = None
+
+        with get_connection() as conn:
+            # Watermark and totals are read from one snapshot so an order committed in between
+            # cannot be counted by the load and then folded in again
+            conn.start_transaction(consistent_snapshot=True, readonly=True)
+            try:
+                watermark = repo.query_one("customers_watermark", conn=conn)
+                if entry is not None and entry['watermark'] == watermark:
+                    self.stats['hits'] += 1
+                    return dict(entry['totals'])
+                if entry is not None and entry['watermark'].updated_at is not None:
+                    changed = repo.query("orders_changed_since", (entry['watermark'].updated_at,), conn)
+                    # Only new orders, and all of them: one that committed late with an updated_at
+                    # below the old watermark is missing from `changed`, so the counts differ
+                    old_max = entry['watermark'].max_id or 0
+                    if (all(row.id > old_max for row in changed)
+                            and len(changed) == (watermark.max_id or 0) - old_max):
+                        return self._fold(key, entry, changed, watermark)
+                return self._load(conn, start, end, watermark)[kind]
+            finally:
+                conn.commit()
+
+    def _fold(self, key, entry, rows, watermark):
+        kind, start, end = key
+        totals = dict(entry['totals'])
+        for row in rows:
+            if start <= row.order_date <= end:
+                period = row.order_date.strftime("%Y-%m-%d" if kind == "daily" else "%Y-%m")
+                totals[period] = totals.get(period, 0) + row.total_amount
+        with self._lock:
+            self._entries[key] = dict(entry, totals=totals, watermark=watermark)
+        self.stats['folds'] += 1
+        return dict(totals)
+
+    def _load(self, conn, start, end, watermark):
+        # The rollup query returns both kinds at once, so both entries are refreshed together
+        reports = dict(zip(REPORT_KINDS, query_sales(conn, start, end)))
+        loaded = time.monotonic()
+        with self._lock:
+            for kind, totals in reports.items():
+                self._entries[(kind, start, end)] = {'totals': totals, 'watermark': watermark, 'loaded': loaded}
+        self.stats['loads'] += 1
+        return {kind: dict(totals) for kind, totals in reports.items()}
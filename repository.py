@@ -0,0 +1,318 @@
+import threading
+import time
+import weakref
+
+from db_config import get_connection, pool, DB_BACKEND
+from instrumentation import metrics
+
+
+class Record:
+    # Lightweight row object: named fields in __slots__, still iterable and indexable like the tuple it replaces
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self.__slots__)
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+def record(name, *fields):
+    return type(name, (Record,), {'__slots__': fields})
+
+
+StockCount = record("StockCount", "no", "frame", "type", "count")
+StockVersion = record("StockVersion", "rows", "updated_at")
+StockRow = record("StockRow", "no", "frame", "type", "count", "date")
+UnpaidBill = record("UnpaidBill", "bill_no", "name", "phone_no", "balance_amount")
+CustomerChange = record("CustomerChange", "bill_no", "name", "phone_no", "balance_amount", "payment", "updated_at", "id")
+BillSummary = record("BillSummary", "bill_no", "balance_amount", "name", "phone_no")
+BillAmounts = record("BillAmounts", "balance_amount", "advance_amount")
+Watermark = record("Watermark", "max_id", "updated_at")
+OrderChange = record("OrderChange", "id", "order_date", "total_amount")
+PlacedOrder = record("PlacedOrder", "customer_id", "stock_left")
+UserLogin = record("UserLogin", "id", "password", "type")
+IndexCustomer = record("IndexCustomer", "id", "name", "phone_no", "bill_no")
+IndexSpectacles = record("IndexSpectacles", "id", "customer_id", "unique_no")
+ChangeVersions = record("ChangeVersions", "customer_id", "customers_updated", "stock_no", "stocks_updated")
+SalesTotal = record("SalesTotal", "kind", "period", "amount")
+PrescriptionRow = record("PrescriptionRow", "id", "name", "phone_no", "bill_no", "remark", "eye_type",
+                         "re_sph", "re_cyl", "re_axis", "le_sph", "le_cyl", "le_axis",
+                         "prescription_id", "spectacles_id")
+CustomerExport = record("CustomerExport", "id", "name", "phone_no", "bill_no", "order_date", "dob", "frame", "type",
+                        "total_amount", "discount", "advance_amount", "balance_amount", "lens", "payment", "remark")
+PrescriptionExport = record("PrescriptionExport", "id", "customer_id", "eye_type", "re_sph", "re_cyl", "re_axis",
+                            "le_sph", "le_cyl", "le_axis")
+SpectaclesExport = record("SpectaclesExport", "id", "customer_id", "frame", "type", "unique_no")
+
+
+class Statement:
+    # `sqlite` is the embedded backend's spelling where MySQL syntax has no direct equivalent
+    # (upserts, INTERVAL date arithmetic) or an aggregate needs its column type named
+    __slots__ = ("name", "sql", "record", "prepared")
+
+    def __init__(self, name, sql, record=None, prepared=True, sqlite=None):
+        self.name = name
+        self.sql = sqlite if sqlite and DB_BACKEND == 'sqlite' else sql
+        self.record = record
+        self.prepared = prepared
+
+
+STATEMENTS = {s.name: s for s in [
+    # --- users ---
+    Statement("user_login", "SELECT id, password, type FROM users WHERE username = %s", UserLogin),
+    Statement("update_password", "UPDATE users SET password = %s WHERE id = %s"),
+
+    # --- stocks ---
+    Statement("stock_catalogue", "SELECT No, Frame, Type, Count FROM Stocks", StockCount),
+    Statement("stock_version", "SELECT COUNT(*), MAX(updated_at) FROM Stocks", StockVersion,
+              sqlite='SELECT COUNT(*), MAX(updated_at) AS "updated_at [timestamp]" FROM Stocks'),
+    Statement("stock_changes", "SELECT No, Frame, Type, Count FROM Stocks WHERE updated_at >= %s", StockCount),
+    Statement("add_stock", "INSERT INTO Stocks (Frame, Type, Count, Date) VALUES (%s, %s, %s, %s)"),
+    # Admin writes only apply while Count is still the value the admin saw; units claimed at
+    # the counters since then make them match no row instead of being overwritten
+    Statement("update_stock", "UPDATE Stocks SET Frame=%s, Type=%s, Count=%s, Date=%s WHERE No=%s AND Count=%s"),
+    Statement("set_stock_count", "UPDATE Stocks SET Count=%s, Date=%s WHERE No=%s AND Count=%s"),
+    Statement("stock_row", "SELECT No, Frame, Type, Count, Date FROM Stocks WHERE No = %s", StockRow),
+    # An order claims its unit up front; the WHERE makes the check and the decrement one
+    # statement, so the row lock lasts that long and a sold-out Frame/Type matches no row
+    Statement("reserve_stock", "UPDATE Stocks SET Count = Count - 1 WHERE Frame = %s AND Type = %s AND Count > 0"),
+    Statement("release_stock", "UPDATE Stocks SET Count = Count + 1 WHERE Frame = %s AND Type = %s"),
+    # Bulk receipt of a shipment: known Frame/Type rows are topped up instead of rejected
+    Statement("import_stock", "INSERT INTO Stocks (Frame, Type, Count, Date) VALUES (%s, %s, %s, %s) "
+                              "ON DUPLICATE KEY UPDATE Count = Count + VALUES(Count), Date = VALUES(Date)", prepared=False,
+              sqlite="INSERT INTO Stocks (Frame, Type, Count, Date) VALUES (%s, %s, %s, %s) "
+                     "ON CONFLICT (Frame, Type) DO UPDATE SET Count = Count + excluded.Count, Date = excluded.Date"),
+
+    # --- customers / bills ---
+    Statement("bill_summary", "SELECT bill_no, balance_amount, name, phone_no FROM customers WHERE bill_no = %s", BillSummary),
+    Statement("bill_amounts", "SELECT balance_amount, advance_amount FROM customers WHERE bill_no = %s", BillAmounts),
+    Statement("mark_bill_paid", "UPDATE customers SET advance_amount = %s, balance_amount = 0, payment='Paid' WHERE bill_no = %s"),
+    Statement("unpaid_bills_by_prefix", "SELECT bill_no, balance_amount, name, phone_no FROM customers "
+                                        "WHERE bill_no LIKE %s AND payment='Not Paid' ORDER BY bill_no LIMIT %s", BillSummary),
+    Statement("customers_watermark", "SELECT MAX(id), MAX(updated_at) FROM customers", Watermark,
+              sqlite='SELECT MAX(id), MAX(updated_at) AS "updated_at [timestamp]" FROM customers'),
+    Statement("customer_changes", "SELECT bill_no, name, phone_no, balance_amount, payment, updated_at, id FROM customers "
+                                  "WHERE updated_at >= %s ORDER BY updated_at", CustomerChange),
+    Statement("orders_changed_since", "SELECT id, order_date, total_amount FROM customers WHERE updated_at > %s", OrderChange),
+    Statement("index_customers_since", "SELECT id, name, phone_no, bill_no FROM customers WHERE id > %s ORDER BY id", IndexCustomer),
+    Statement("index_spectacles_since", "SELECT id, customer_id, unique_no FROM Spectacles_no WHERE id > %s ORDER BY id", IndexSpectacles),
+    # One round trip per order sent from the local journal (order_journal.py). The procedure
+    # returns its result set after the CALL, which the binary protocol cannot carry here
+    Statement("place_order", "CALL place_order(" + ", ".join(["%s"] * 28) + ")", PlacedOrder, prepared=False),
+
+    # --- change feed ---
+    # Four index dives and no writes: the newest id catches inserts, the newest updated_at edits
+    Statement("change_versions", "SELECT (SELECT MAX(id) FROM customers), (SELECT MAX(updated_at) FROM customers), "
+                                 "(SELECT MAX(No) FROM Stocks), (SELECT MAX(updated_at) FROM Stocks)", ChangeVersions),
+
+    # --- export (streamed in id order, see data_export.py); every dataset stops at the same customer id ---
+    Statement("export_customers", "SELECT id, name, phone_no, bill_no, order_date, dob, Frame, Type, total_amount, discount, "
+                                  "advance_amount, balance_amount, Lens, payment, remark FROM customers "
+                                  "WHERE id > %s AND id <= %s AND order_date BETWEEN %s AND %s ORDER BY id", CustomerExport),
+    Statement("export_prescriptions", "SELECT p.id, p.customer_id, p.eye_type, p.re_sph, p.re_cyl, p.re_axis, p.le_sph, p.le_cyl, p.le_axis "
+                                      "FROM eye_prescriptions p JOIN customers c ON c.id = p.customer_id "
+                                      "WHERE p.id > %s AND c.id <= %s AND c.order_date BETWEEN %s AND %s ORDER BY p.id", PrescriptionExport),
+    Statement("export_spectacles", "SELECT s.id, s.customer_id, s.Frame, s.Type, s.unique_no "
+                                   "FROM Spectacles_no s JOIN customers c ON c.id = s.customer_id "
+                                   "WHERE s.id > %s AND c.id <= %s AND c.order_date BETWEEN %s AND %s ORDER BY s.id", SpectaclesExport),
+
+    # --- sales rollups ---
+    Statement("sales_totals", """
+        SELECT 'day', day, SUM(amount) FROM sales_daily
+        WHERE day BETWEEN %s AND %s GROUP BY day
+        UNION ALL
+        SELECT 'month', month, SUM(amount) FROM sales_monthly
+        WHERE month BETWEEN %s AND %s GROUP BY month
+        UNION ALL
+        SELECT 'month', day - INTERVAL (DAY(day) - 1) DAY AS month, SUM(amount) FROM sales_daily
+        WHERE day BETWEEN %s AND %s AND (day < %s OR day >= %s) GROUP BY month
+    """, SalesTotal, sqlite="""
+        SELECT 'day', day AS "period [date]", SUM(amount) AS "amount [decimal]" FROM sales_daily
+        WHERE day BETWEEN %s AND %s GROUP BY day
+        UNION ALL
+        SELECT 'month', month, SUM(amount) FROM sales_monthly
+        WHERE month BETWEEN %s AND %s GROUP BY month
+        UNION ALL
+        SELECT 'month', date(day, 'start of month') AS month, SUM(amount) FROM sales_daily
+        WHERE day BETWEEN %s AND %s AND (day < %s OR day >= %s) GROUP BY month
+    """),
+    Statement("rollup_clear_daily", "DELETE FROM sales_daily"),
+    Statement("rollup_clear_monthly", "DELETE FROM sales_monthly"),
+    Statement("rollup_fill_daily", """
+        INSERT INTO sales_daily (day, Frame, Type, orders, amount, collected)
+        SELECT order_date, Frame, Type, COUNT(*), SUM(total_amount), SUM(advance_amount)
+        FROM customers GROUP BY order_date, Frame, Type"""),
+    Statement("rollup_fill_monthly", """
+        INSERT INTO sales_monthly (month, Frame, Type, orders, amount, collected)
+        SELECT day - INTERVAL (DAY(day) - 1) DAY AS month, Frame, Type, SUM(orders), SUM(amount), SUM(collected)
+        FROM sales_daily GROUP BY month, Frame, Type""", sqlite="""
+        INSERT INTO sales_monthly (month, Frame, Type, orders, amount, collected)
+        SELECT date(day, 'start of month') AS month, Frame, Type, SUM(orders), SUM(amount), SUM(collected)
+        FROM sales_daily GROUP BY month, Frame, Type"""),
+    Statement("rollup_daily_rows", "SELECT COUNT(*) FROM sales_daily"),
+]}
+
+
+def _decode(row):
+    # Prepared cursors may hand back text columns as bytearray
+    return tuple(v.decode() if isinstance(v, (bytes, bytearray)) else v for v in row)
+
+
+class Repository:
+    # Runs the app's SQL by name. Each pooled connection keeps one server-side prepared
+    # cursor per statement, so a statement is parsed once per connection and then only
+    # executed. Latency and row counts per statement go to instrumentation.metrics.
+    def __init__(self):
+        self._cursors = weakref.WeakKeyDictionary()   # connection -> {sql: prepared cursor}
+        self._lock = threading.Lock()
+        pool.reconnect_hooks.append(self.forget)
+
+    def forget(self, conn):
+        # Prepared statements do not survive a reconnect
+        with self._lock:
+            self._cursors.pop(conn, None)
+
+    def _cursor(self, conn, sql, prepared):
+        if not prepared:
+            return conn.cursor(), True
+        with self._lock:
+            cursors = self._cursors.setdefault(conn, {})
+        cursor = cursors.get(sql)
+        if cursor is None:
+            cursor = cursors[sql] = conn.cursor(prepared=True)
+        return cursor, False
+
+    def _record(self, name, started, rows, sql=None, error=None):
+        # Also called for failed statements, so timeouts show up in the figures and the slow log
+        metrics.record_query(name, (time.perf_counter() - started) * 1000, rows, sql,
+                             type(error).__name__ if error is not None else None)
+
+    def _run(self, conn, name, sql, params, prepared, fetch):
+        started = time.perf_counter()
+        count, error = 0, None
+        cursor, owned = self._cursor(conn, sql, prepared)
+        try:
+            cursor.execute(sql, tuple(params))
+            if fetch:
+                result = [_decode(row) for row in cursor.fetchall()]
+                if owned:
+                    while cursor.nextset():
+                        pass
+                count = len(result)
+            else:
+                result = cursor.rowcount, cursor.lastrowid
+                count = cursor.rowcount
+        except Exception as e:
+            error = e
+            # A failed statement may leave the cursor mid-result; prepare it afresh next time
+            if not owned:
+                with self._lock:
+                    self._cursors.get(conn, {}).pop(sql, None)
+            raise
+        finally:
+            if owned:
+                cursor.close()
+            self._record(name, started, max(count, 0), sql, error)
+        return result
+
+    def _with_conn(self, conn, fn, commit=False):
+        if conn is not None:
+            return fn(conn)
+        with get_connection() as conn:
+            result = fn(conn)
+            if commit:
+                conn.commit()
+            return result
+
+    def query(self, name, params=(), conn=None):
+        stmt = STATEMENTS[name]
+        rows = self._with_conn(conn, lambda c: self._run(c, name, stmt.sql, params, stmt.prepared, True))
+        return [stmt.record(*row) for row in rows] if stmt.record else rows
+
+    def query_one(self, name, params=(), conn=None):
+        rows = self.query(name, params, conn)
+        return rows[0] if rows else None
+
+    def column(self, name, params=(), conn=None):
+        return [row[0] for row in self.query(name, params, conn)]
+
+    def execute(self, name, params=(), conn=None):
+        # Writes commit on their own connection; with a caller's `conn` the caller commits
+        stmt = STATEMENTS[name]
+        return self._with_conn(conn, lambda c: self._run(c, name, stmt.sql, params, stmt.prepared, False), commit=True)
+
+    def execute_many(self, name, rows, conn=None):
+        # Plain cursors turn a batch of INSERT rows into one multi-row INSERT; prepared
+        # statements would send them one by one, so batch statements are declared prepared=False
+        stmt = STATEMENTS[name]
+        rows = [tuple(row) for row in rows]
+
+        def run(c):
+            started = time.perf_counter()
+            count, error = 0, None
+            cursor = c.cursor(prepared=stmt.prepared)
+            try:
+                cursor.executemany(stmt.sql, rows)
+                count = cursor.rowcount
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                cursor.close()
+                self._record(name, started, max(count, 0), stmt.sql, error)
+            return count
+        return self._with_conn(conn, run, commit=True)
+
+    def stream(self, name, params, conn, chunk=1000):
+        # Yields lists of at most `chunk` records from an unbuffered cursor: the server sends rows
+        # as they are consumed, so memory stays at one chunk however large the result. `conn`
+        # cannot run anything else until the generator is exhausted or closed.
+        stmt = STATEMENTS[name]
+        started = time.perf_counter()
+        count, error = 0, None
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute(stmt.sql, tuple(params))
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                count += len(rows)
+                rows = [_decode(row) for row in rows]
+                yield [stmt.record(*row) for row in rows] if stmt.record else rows
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if conn.unread_result:
+                conn.consume_results()
+            cursor.close()
+            self._record(name, started, count, stmt.sql, error)
+
+    def query_sql(self, name, sql, params=(), record=None, conn=None):
+        # For statements assembled from fixed parts at runtime (keyset pages); cached by SQL text
+        rows = self._with_conn(conn, lambda c: self._run(c, name, sql, params, True, True))
+        return [record(*row) for row in rows] if record else rows
+
+    def stats(self):
+        return metrics.snapshot()['queries']
+
+
+repo = Repository()
@@ -0,0 +1,67 @@
+import sys
+from datetime import timedelta
+
+from db_config import get_connection
+from repository import repo
+
+# sales_daily / sales_monthly hold per (period, Frame, Type) totals of customers.total_amount
+# (amount) and advance_amount (collected). The triggers in OmkarOptic.sql / schema_updates.sql
+# keep them current on insert, payment update and delete; rows removed by the stocks
+# ON DELETE CASCADE do not fire triggers, so run `python sales_rollup.py rebuild` after
+# deleting stock items or when installing the rollups on an existing database.
+
+REBUILD_STATEMENTS = ["rollup_clear_daily", "rollup_clear_monthly", "rollup_fill_daily", "rollup_fill_monthly"]
+
+
+def rebuild():
+    with get_connection() as conn:
+        conn.start_transaction()
+        for name in REBUILD_STATEMENTS:
+            repo.execute(name, conn=conn)
+        conn.commit()
+        return repo.column("rollup_daily_rows", conn=conn)[0]
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def full_months(start, end):
+    # First and last month lying completely inside [start, end]; first > last when there is none
+    first = start if start.day == 1 else next_month(start)
+    last = month_start(end) if next_month(end) - timedelta(days=1) == end else month_start(month_start(end) - timedelta(days=1))
+    return first, last
+
+
+def fetch_sales(start, end):
+    with get_connection() as conn:
+        return query_sales(conn, start, end)
+
+
+def query_sales(conn, start, end):
+    # Daily totals come from sales_daily; monthly totals from sales_monthly for whole months
+    # and from sales_daily for the partial months at either edge of the range. One round trip.
+    first, last = full_months(start, end)
+    data = repo.query("sales_totals", (start, end, first, last, start, end, first, next_month(last)), conn)
+
+    daily_sales = {}
+    monthly_sales = {}
+    for row in data:
+        if row.kind == 'day':
+            daily_sales[row.period.strftime("%Y-%m-%d")] = row.amount
+        else:
+            key = row.period.strftime("%Y-%m")
+            monthly_sales[key] = monthly_sales.get(key, 0) + row.amount
+    return daily_sales, monthly_sales
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        print(f"Rebuilt sales rollups: {rebuild()} daily rows")
+    else:
+        print("Usage: python sales_rollup.py rebuild")
+        sys.exit(2)
@@ -0,0 +1,101 @@
+import threading
+from bisect import bisect_left
+
+from repository import repo, record
+
+SUGGEST_FIELDS = ("phone_no", "bill_no", "unique_no", "name")
+REREAD_IDS = 200     # ids re-read behind the highest one seen, for rows that commit out of id order
+
+Suggestion = record("Suggestion", "field", "value", "customer_id", "name", "phone_no", "bill_no")
+
+
+class CustomerIndex:
+    # In-memory prefix index for type-ahead on the Details of Spectacles tab. Each field keeps a
+    # sorted list of (key, customer_id, value) so a prefix is one bisect plus a short walk.
+    # refresh() loads everything the first time and afterwards only customers and spectacles
+    # numbers with an id above the highest one seen, less REREAD_IDS (two primary-key range
+    # reads). The overlap catches a lower id that commits after a higher one, e.g. an order
+    # batch still open at another counter; rows read again are already indexed and skipped.
+    # Orders saved at this counter are added directly. Names are matched case-insensitively. Deleted
+    # customers stay suggestible until the dashboard is reopened and then simply find nothing.
+    def __init__(self):
+        self._entries = {field: [] for field in SUGGEST_FIELDS}
+        self._customers = {}     # id -> (name, phone_no, bill_no)
+        self._lock = threading.Lock()
+        self.max_customer_id = 0
+        self.max_spectacles_id = 0
+
+    @staticmethod
+    def _key(field, value):
+        return value.lower() if field == "name" else value
+
+    def _add(self, field, value, customer_id):
+        if not value:
+            return
+        value = str(value)
+        entry = (self._key(field, value), customer_id, value)
+        entries = self._entries[field]
+        i = bisect_left(entries, entry)
+        if i == len(entries) or entries[i] != entry:
+            entries.insert(i, entry)
+            return True
+        return False
+
+    def _add_customer(self, customer_id, name, phone_no, bill_no):
+        self._customers[customer_id] = (name, phone_no, bill_no)
+        self._add("name", name, customer_id)
+        self._add("phone_no", phone_no, customer_id)
+        self._add("bill_no", bill_no, customer_id)
+
+    def add_order(self, customer_id, name, phone_no, bill_no, unique_no):
+        with self._lock:
+            self._add_customer(customer_id, name, phone_no, bill_no)
+            self._add("unique_no", unique_no, customer_id)
+
+    def refresh(self):
+        # Worker thread; returns the number of new rows picked up
+        customers = repo.query("index_customers_since", (max(self.max_customer_id - REREAD_IDS, 0),))
+        spectacles = repo.query("index_spectacles_since", (max(self.max_spectacles_id - REREAD_IDS, 0),))
+        added = 0
+        with self._lock:
+            for row in customers:
+                if row.id not in self._customers:
+                    self._add_customer(row.id, row.name, row.phone_no, row.bill_no)
+                    added += 1
+            for row in spectacles:
+                added += self._add("unique_no", row.unique_no, row.customer_id)
+            if customers:
+                self.max_customer_id = max(self.max_customer_id, customers[-1].id)      # rows are ordered by id
+            if spectacles:
+                self.max_spectacles_id = max(self.max_spectacles_id, spectacles[-1].id)
+        return added
+
+    def _matches(self, field, prefix):
+        key = self._key(field, prefix)
+        entries = self._entries[field]
+        i = bisect_left(entries, (key,))
+        while i < len(entries) and entries[i][0].startswith(key):
+            yield entries[i]
+            i += 1
+
+    def suggest(self, field, prefix, limit=8):
+        if not prefix:
+            return []
+        suggestions = []
+        with self._lock:
+            for _, customer_id, value in self._matches(field, prefix):
+                if len(suggestions) == limit:
+                    break
+                name, phone_no, bill_no = self._customers.get(customer_id, ("", "", ""))
+                suggestions.append(Suggestion(field, value, customer_id, name, phone_no, bill_no))
+        return suggestions
+
+    def customer_ids(self, field, prefix, limit):
+        ids = []
+        with self._lock:
+            for _, customer_id, _ in self._matches(field, prefix):
+                if customer_id not in ids:
+                    ids.append(customer_id)
+                    if len(ids) == limit:
+                        break
+        return ids
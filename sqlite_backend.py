@@ -0,0 +1,226 @@
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+# Embedded database for single-counter shops (db_config.DB_BACKEND = 'sqlite'). connect()
+# returns a connection with the small part of the mysql.connector API the app uses, so the
+# pool, the repository and the windows run unchanged:
+#  * %s placeholders become ?, and LIKE gets the backslash escape MySQL uses by default
+#  * CALL place_order(...) runs the steps of the MySQL procedure in one transaction
+#  * date, timestamp and decimal columns come back as date, datetime and Decimal
+# The schema (OmkarOptic.sqlite.sql) is applied the first time an empty file is opened and
+# MIGRATIONS bring older files up to SCHEMA_VERSION; the file is kept in WAL mode so the
+# counter window reads while a background job writes.
+
+Error = sqlite3.Error
+IntegrityError = sqlite3.IntegrityError
+InterfaceError = sqlite3.InterfaceError
+OperationalError = sqlite3.OperationalError
+
+SCHEMA_VERSION = 3
+# Steps from the previous version, keyed by the version they produce
+MIGRATIONS = {
+    # Stock is claimed by reserve_stock / place_order instead of by a trigger
+    2: "DROP TRIGGER IF EXISTS update_stock_after_order;",
+    # The counters probe the customers/stocks watermarks instead of change_log
+    3: "DROP TRIGGER IF EXISTS customers_changed_after_insert; DROP TRIGGER IF EXISTS customers_changed_after_update; "
+       "DROP TRIGGER IF EXISTS customers_changed_after_delete; DROP TRIGGER IF EXISTS stocks_changed_after_insert; "
+       "DROP TRIGGER IF EXISTS stocks_changed_after_update; DROP TRIGGER IF EXISTS stocks_changed_after_delete; "
+       "DROP TABLE IF EXISTS change_log;",
+}
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, date.isoformat)
+# Same precision as the schema's strftime('%f') defaults, so text comparisons line up
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", timespec="milliseconds"))
+sqlite3.register_converter("date", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("timestamp", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("decimal", lambda value: Decimal(value.decode()))
+
+_CALL = re.compile(r"\s*CALL\s+(\w+)\s*\(", re.IGNORECASE)
+_LIKE = re.compile(r"\bLIKE\s+%s", re.IGNORECASE)
+_translated = {}
+_schema_lock = threading.Lock()
+
+
+def translate(sql):
+    text = _translated.get(sql)
+    if text is None:
+        text = _translated[sql] = _LIKE.sub(r"LIKE ? ESCAPE '\\'", sql).replace("%s", "?")
+    return text
+
+
+def place_order(conn, *params):
+    # Same steps as the MySQL procedure: one unit of stock is claimed first (unless the caller
+    # already claimed it), the order, both prescriptions and the spectacles number commit
+    # together, then (customer id, stock left for the Frame/Type) is returned. A failed order
+    # gives back the unit claimed here. A bill already saved with the same spectacles number is
+    # only looked up.
+    order, unique_no, distance, reading, claimed = params[:14], params[14], params[15:21], params[21:27], params[27]
+    if conn.in_transaction:
+        conn.commit()       # START TRANSACTION in the procedure commits anything pending, too
+    existing = conn.execute("SELECT c.id, s.unique_no FROM customers c LEFT JOIN spectacles_no s ON s.customer_id = c.id "
+                            "WHERE c.bill_no = ?", (order[2],)).fetchone()
+    if existing is not None:
+        if existing[1] != unique_no:
+            raise IntegrityError(f"Bill number {order[2]} is already used by another order.")
+        return conn.execute("SELECT ?, Count FROM stocks WHERE Frame = ? AND Type = ?",
+                            (existing[0], order[5], order[6])).fetchall()
+    if not claimed:
+        if not conn.execute("UPDATE stocks SET Count = Count - 1 WHERE Frame = ? AND Type = ? AND Count > 0",
+                            (order[5], order[6])).rowcount:
+            conn.rollback()
+            raise IntegrityError("Out of stock")
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        customer_id = conn.execute(
+            "INSERT INTO customers (name, phone_no, bill_no, order_date, dob, Frame, Type, total_amount, discount, "
+            "advance_amount, balance_amount, Lens, payment, remark) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            order).lastrowid
+        conn.executemany(
+            "INSERT INTO eye_prescriptions (customer_id, eye_type, re_sph, re_cyl, re_axis, le_sph, le_cyl, le_axis) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(customer_id, "Distance", *distance), (customer_id, "Reading", *reading)])
+        conn.execute("INSERT INTO spectacles_no (customer_id, Frame, Type, unique_no) VALUES (?, ?, ?, ?)",
+                     (customer_id, order[5], order[6], unique_no))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if not claimed:
+            conn.execute("UPDATE stocks SET Count = Count + 1 WHERE Frame = ? AND Type = ?", (order[5], order[6]))
+            conn.commit()
+        raise
+    return conn.execute("SELECT ?, Count FROM stocks WHERE Frame = ? AND Type = ?",
+                        (customer_id, order[5], order[6])).fetchall()
+
+
+PROCEDURES = {"place_order": place_order}
+
+
+class Cursor:
+    def __init__(self, raw):
+        self._raw = raw
+        self._cursor = raw.cursor()
+        self._result = None     # rows returned by an emulated CALL
+
+    def execute(self, sql, params=()):
+        call = _CALL.match(sql)
+        if call:
+            self._result = PROCEDURES[call.group(1).lower()](self._raw, *params)
+            return
+        self._result = None
+        self._cursor.execute(translate(sql), params)
+
+    def executemany(self, sql, rows):
+        self._result = None
+        self._cursor.executemany(translate(sql), rows)
+
+    def fetchone(self):
+        if self._result is not None:
+            return self._result.pop(0) if self._result else None
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        if self._result is not None:
+            rows, self._result = self._result[:size], self._result[size:]
+            return rows
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        if self._result is not None:
+            rows, self._result = self._result, []
+            return rows
+        return self._cursor.fetchall()
+
+    def nextset(self):
+        return None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    unread_result = False   # sqlite3 cursors never hold a connection the way unbuffered MySQL results do
+
+    def __init__(self, database, timeout):
+        self.database = database
+        self.timeout = timeout
+        self._raw = None
+        self._open()
+
+    def _open(self):
+        # The pool hands connections between worker threads, one thread at a time
+        raw = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False, cached_statements=256,
+                              detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        raw.execute("PRAGMA foreign_keys = ON")
+        raw.execute("PRAGMA synchronous = NORMAL")     # durable at every checkpoint; WAL keeps it consistent
+        self._raw = raw
+
+    def cursor(self, prepared=False, buffered=True):
+        # sqlite3 keeps its own per-connection cache of prepared statements
+        return Cursor(self._raw)
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    def start_transaction(self, consistent_snapshot=False, readonly=False):
+        # A deferred transaction reads from one snapshot; writers take the lock up front so
+        # two of them cannot both read and then fail to upgrade
+        self._raw.execute("BEGIN" if readonly else "BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def consume_results(self):
+        pass
+
+    def ping(self):
+        self._raw.execute("SELECT 1")
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except Error:
+            return False
+
+    def reconnect(self, attempts=1):
+        self.close()
+        self._open()
+
+    def close(self):
+        self._raw.close()
+
+
+def _ensure_schema(conn, schema):
+    with _schema_lock:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if version == 0:
+            with open(schema, encoding="utf-8") as f:
+                conn.executescript(f.read())
+            return
+        for step in range(version + 1, SCHEMA_VERSION + 1):
+            conn.executescript(f"BEGIN; {MIGRATIONS[step]} PRAGMA user_version = {step}; COMMIT;")
+
+
+def connect(database, schema, timeout=5):
+    conn = Connection(database, timeout)
+    _ensure_schema(conn._raw, schema)
+    return conn
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+
+PROCESS_START = time.perf_counter()
+REPORT_PATH = os.path.join(os.path.expanduser("~"), "omkar_optics_startup.json")
+BACKGROUND_SIZE = (500, 500)
+
+# Work done behind the splash screen and picked up by the windows that need it
+preloaded = {}
+
+
+def base_dir():
+    return getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+
+
+class StartupTimer:
+    # Milliseconds spent in each startup phase, written to REPORT_PATH as JSON
+    def __init__(self):
+        self.phases = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def mark(self, name):
+        # Time from process start until now, e.g. module imports before the splash appears
+        with self._lock:
+            self.phases[name] = round((time.perf_counter() - PROCESS_START) * 1000, 1)
+
+    def report(self):
+        with self._lock:
+            return {
+                'since_process_start_ms': round((time.perf_counter() - PROCESS_START) * 1000, 1),
+                'phases_ms': dict(self.phases),
+                'errors': dict(self.errors),
+            }
+
+    def save(self, path=REPORT_PATH):
+        try:
+            with open(path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+        except OSError as e:
+            print(f"Could not write startup report: {e}")
+
+
+timer = StartupTimer()
+
+
+def warm_pool():
+    from db_config import pool
+    pool.warm(2)
+
+
+def decode_background():
+    img = Image.open(os.path.join(base_dir(), "Bg1.png")).resize(BACKGROUND_SIZE, Image.Resampling.LANCZOS)
+    img.load()
+    preloaded['background'] = img
+
+
+def load_stock_catalogue():
+    from stock_catalogue import StockCatalogue
+    catalogue = StockCatalogue()
+    catalogue.load()
+    preloaded['catalogue'] = catalogue
+
+
+PRELOAD_TASKS = [
+    ("warm_db_pool", warm_pool),
+    ("decode_background", decode_background),
+    ("stock_catalogue", load_stock_catalogue),
+]
+
+
+def run_preload(done, tasks=PRELOAD_TASKS):
+    # Runs on a background thread; `done` grows by one name per finished task so the
+    # splash screen can show real progress. Failures are recorded and startup continues.
+    for name, task in tasks:
+        with timer.phase(name):
+            try:
+                task()
+            except Exception as e:
+                timer.errors[name] = str(e)
+        done.append(name)
@@ -0,0 +1,87 @@
+import threading
+from datetime import timedelta
+
+from db_config import get_connection
+from repository import repo
+
+SYNC_OVERLAP = timedelta(seconds=2)    # re-read window behind a watermark (stocks here, customers in dashboard.py)
+
+
+class StockCatalogue:
+    # Every stock row as Frame -> {Type: Count}, loaded in one query. The version is
+    # (row count, MAX(stocks.updated_at)); refresh() probes it and, when only updated_at moved,
+    # re-reads just the rows changed since then (stock claimed by orders at other counters,
+    # admin edits). A changed row count means stock was added or deleted, which reloads
+    # everything. Counts returned by this counter's own orders
+    # are applied directly with set_count().
+    def __init__(self):
+        self._items = {}       # Frame -> {Type: Count}
+        self._rows = {}        # stock No -> (Frame, Type), so edits that rename a row move it
+        self._lock = threading.Lock()
+        self.version = None
+
+    @property
+    def loaded(self):
+        return self.version is not None
+
+    def load(self):
+        with get_connection() as conn:
+            # Version and rows from one snapshot so nothing committed in between is skipped
+            conn.start_transaction(consistent_snapshot=True, readonly=True)
+            try:
+                version = repo.query_one("stock_version", conn=conn)
+                rows = repo.query("stock_catalogue", conn=conn)
+            finally:
+                conn.commit()
+        with self._lock:
+            self._items = {}
+            self._rows = {}
+            for row in rows:
+                self._put(row)
+            self.version = version
+        return True
+
+    def refresh(self):
+        # Worker thread; True when anything changed
+        if not self.loaded:
+            return self.load()
+        version = repo.query_one("stock_version")
+        if version == self.version:
+            return False
+        if version.rows != self.version.rows or self.version.updated_at is None:
+            return self.load()
+        changed = repo.query("stock_changes", (self.version.updated_at - SYNC_OVERLAP,))
+        with self._lock:
+            for row in changed:
+                self._put(row)
+            self.version = version
+        return True
+
+    def _put(self, row):
+        old = self._rows.get(row.no)
+        if old is not None and old != (row.frame, row.type):
+            types = self._items.get(old[0], {})
+            types.pop(old[1], None)
+            if not types:
+                self._items.pop(old[0], None)
+        self._rows[row.no] = (row.frame, row.type)
+        self._items.setdefault(row.frame, {})[row.type] = row.count
+
+    def set_count(self, frame, frame_type, count):
+        with self._lock:
+            types = self._items.get(frame)
+            if types is not None and frame_type in types:
+                types[frame_type] = count
+
+    def frames(self):
+        # Frames with at least one type in stock
+        with self._lock:
+            return sorted(frame for frame, types in self._items.items() if any(c > 0 for c in types.values()))
+
+    def types(self, frame):
+        with self._lock:
+            return sorted(t for t, count in self._items.get(frame, {}).items() if count > 0)
+
+    def count(self, frame, frame_type):
+        with self._lock:
+            return self._items.get(frame, {}).get(frame_type)
@@ -0,0 +1,101 @@
+import csv
+import sys
+from datetime import date
+
+
+from db_config import get_connection, Error
+from repository import repo
+
+IMPORT_BATCH = 200      # rows per INSERT ... ON DUPLICATE KEY UPDATE transaction
+MAX_NAME = 50           # Stocks.Frame / Stocks.Type are varchar(50)
+HEADER = ["frame", "type", "count"]
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0       # rows written (new or topped up)
+        self.batches = 0
+        self.errors = []        # (line number, message)
+
+    def summary(self):
+        text = f"{self.imported} rows imported in {self.batches} batches."
+        if self.errors:
+            text += f" {len(self.errors)} rows skipped."
+        return text
+
+
+def parse_row(fields):
+    # Returns (Frame, Type, Count) or raises ValueError with a message for the user
+    if len(fields) != 3:
+        raise ValueError(f"expected 3 columns (Frame, Type, Count), got {len(fields)}")
+    frame, type_, count = (f.strip() for f in fields)
+    if not frame or not type_:
+        raise ValueError("Frame and Type are required")
+    if len(frame) > MAX_NAME or len(type_) > MAX_NAME:
+        raise ValueError(f"Frame and Type must be at most {MAX_NAME} characters")
+    if not count.isdigit() or int(count) == 0:
+        raise ValueError(f"Count must be a positive whole number, got '{count}'")
+    return frame, type_, int(count)
+
+
+def read_rows(lines, result):
+    # Streams (line number, row) pairs; invalid rows go to result.errors. A header row is optional.
+    for line_no, fields in enumerate(csv.reader(lines), start=1):
+        if not any(f.strip() for f in fields):
+            continue
+        if line_no == 1 and [f.strip().lower() for f in fields] == HEADER:
+            continue
+        try:
+            yield line_no, parse_row(fields)
+        except ValueError as e:
+            result.errors.append((line_no, str(e)))
+
+
+def _write_batch(batch, received, result):
+    rows = [(frame, type_, count, received) for _, (frame, type_, count) in batch]
+    try:
+        with get_connection() as conn:
+            conn.start_transaction()
+            repo.execute_many("import_stock", rows, conn)
+            conn.commit()
+        result.imported += len(rows)
+        result.batches += 1
+        return
+    except Error:
+        pass
+    # The batch was rolled back as a whole; retry row by row to find the rows at fault
+    for (line_no, _), row in zip(batch, rows):
+        try:
+            repo.execute("import_stock", row)
+            result.imported += 1
+        except Error as e:
+            # mysql.connector keeps the bare message in .msg; sqlite3 errors only have str()
+            result.errors.append((line_no, getattr(e, "msg", None) or str(e)))
+    result.batches += 1
+
+
+def import_stock(path, received=None, batch_size=IMPORT_BATCH):
+    # Memory use is bounded by one batch whatever the size of the file
+    received = received or date.today()
+    result = ImportResult()
+    batch = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for item in read_rows(f, result):
+            batch.append(item)
+            if len(batch) == batch_size:
+                _write_batch(batch, received, result)
+                batch = []
+    if batch:
+        _write_batch(batch, received, result)
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python stock_import.py shipment.csv")
+        sys.exit(2)
+    outcome = import_stock(sys.argv[1])
+    print(outcome.summary())
+    for line_no, message in outcome.errors:
+        print(f"line {line_no}: {message}")
+    sys.exit(1 if outcome.errors else 0)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The application modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The tests run the pool, the repository and the journal against SQLite files
+os.environ["OMKAR_DB_BACKEND"] = "sqlite"
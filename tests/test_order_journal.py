@@ -0,0 +1,127 @@
+import json
+from datetime import date
+
+import pytest
+
+import db_config
+from order_journal import OrderJournal, reserve_stock
+from repository import repo
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    # A fresh shop database for each test, reached through the app's own pool
+    db_config.pool.close_all()
+    monkeypatch.setitem(db_config.pool.config, "database", str(tmp_path / "shop.db"))
+    journal = OrderJournal(str(tmp_path / "orders.db"))
+    yield journal
+    db_config.pool.close_all()
+
+
+def run(sql, params=()):
+    with db_config.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        conn.commit()
+    return rows
+
+
+def add_stock(frame, frame_type, count):
+    run("INSERT INTO stocks (Frame, Type, Count, Date) VALUES (%s, %s, %s, %s)", (frame, frame_type, count, date.today()))
+
+
+def stock_count(frame="Rayban", frame_type="Round"):
+    return run("SELECT Count FROM stocks WHERE Frame = %s AND Type = %s", (frame, frame_type))[0][0]
+
+
+def customer(bill_no, frame="Rayban", frame_type="Round"):
+    return ["Asha Patil", "9876543210", bill_no, "2026-10-18", "1990-01-01", frame, frame_type,
+            "1500.00", "100.00", "400.00", "1000.00", "Blue Cut", "Not Paid", "Urgent"]
+
+
+DISTANCE = [0.5, -0.25, 90, 0.75, 0, 0]
+READING = [1.5, 0, 0, 1.5, 0, 0]
+
+
+def save(journal, bill_no, unique_no, reserved=False):
+    journal.append(customer(bill_no), DISTANCE, READING, unique_no, reserved)
+
+
+def place_on_server(bill_no, unique_no):
+    return repo.query_one("place_order", (*customer(bill_no), unique_no, *DISTANCE, *READING, False))
+
+
+def payload(journal, bill_no):
+    return json.loads(journal._execute("SELECT payload FROM orders WHERE bill_no = ?", (bill_no,))[0][0])
+
+
+def test_flush_sends_pending_order(journal):
+    add_stock("Rayban", "Round", 2)
+    save(journal, "B1", "U1")
+    [sent] = journal.flush()
+    assert (sent.customer[2], sent.unique_no, sent.stock_left) == ("B1", "U1", 1)
+    assert stock_count() == 1
+    assert run("SELECT bill_no FROM customers WHERE id = %s", (sent.customer_id,)) == [("B1",)]
+    assert journal.counts() == {"sent": 1}
+    assert journal.flush() == []
+
+
+def test_order_already_on_server_is_only_marked_sent(journal):
+    add_stock("Rayban", "Round", 2)
+    placed = place_on_server("B1", "U1")      # sent before the journal could record it
+    save(journal, "B1", "U1")
+    [sent] = journal.flush()
+    assert sent.customer_id == placed.customer_id
+    assert stock_count() == 1
+    assert run("SELECT COUNT(*) FROM customers") == [(1,)]
+    assert journal.counts() == {"sent": 1}
+
+
+def test_clashing_numbers_are_marked_failed(journal):
+    add_stock("Rayban", "Round", 3)
+    place_on_server("B0", "U0")
+    save(journal, "B0", "U1")                 # bill number taken by another order
+    save(journal, "B1", "U0")                 # spectacles number taken
+    assert journal.flush() == []
+    assert [(entry.bill_no, entry.status) for entry in journal.entries()] == [("B0", "failed"), ("B1", "failed")]
+    assert "already used" in journal.entries()[0].error
+    assert stock_count() == 2
+    assert run("SELECT COUNT(*) FROM customers") == [(1,)]
+
+
+def test_out_of_stock_is_marked_failed(journal):
+    add_stock("Rayban", "Round", 0)
+    save(journal, "B1", "U1")
+    assert journal.flush() == []
+    [entry] = journal.entries()
+    assert (entry.status, entry.error) == ("failed", "Out of stock")
+    assert stock_count() == 0
+
+
+def test_rejected_claimed_order_gives_unit_back(journal):
+    add_stock("Rayban", "Round", 3)
+    place_on_server("B0", "U1")
+    reserve_stock("Rayban", "Round")          # claimed at the counter
+    assert stock_count() == 1
+    save(journal, "B1", "U1", reserved=True)
+    assert journal.flush() == []
+    assert journal.entries()[0].status == "failed"
+    assert stock_count() == 2
+    assert payload(journal, "B1")["reserved"] is False
+
+
+def test_retry_sends_failed_order_again(journal):
+    add_stock("Rayban", "Round", 0)
+    save(journal, "B1", "U1")
+    journal.flush()
+    [entry] = journal.entries()
+    run("UPDATE stocks SET Count = 1 WHERE Frame = %s AND Type = %s", ("Rayban", "Round"))
+    journal.retry([entry.id])
+    assert journal.entries()[0].status == "pending"
+    [sent] = journal.flush()
+    assert sent.stock_left == 0
+    assert journal.counts() == {"sent": 1}
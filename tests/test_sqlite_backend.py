@@ -0,0 +1,147 @@
+import os
+import sqlite3
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import sqlite_backend
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "OmkarOptic.sqlite.sql")
+PLACE_ORDER = "CALL place_order(" + ", ".join(["%s"] * 28) + ")"
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite_backend.connect(str(tmp_path / "shop.db"), SCHEMA)
+    yield conn
+    conn.close()
+
+
+def run(conn, sql, params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def add_stock(conn, frame, frame_type, count):
+    run(conn, "INSERT INTO stocks (Frame, Type, Count, Date) VALUES (%s, %s, %s, %s)", (frame, frame_type, count, date.today()))
+    conn.commit()
+
+
+def stock_count(conn, frame, frame_type):
+    return run(conn, "SELECT Count FROM stocks WHERE Frame = %s AND Type = %s", (frame, frame_type))[0][0]
+
+
+def order(bill_no, unique_no, frame="Rayban", frame_type="Round", claimed=False):
+    customer = ("Asha Patil", "9876543210", bill_no, date(2026, 10, 18), date(1990, 1, 1), frame, frame_type,
+                Decimal("1500.00"), Decimal("100.00"), Decimal("400.00"), Decimal("1000.00"), "Blue Cut", "Not Paid", "Urgent")
+    return (*customer, unique_no, 0.5, -0.25, 90, 0.75, 0, 0, 1.5, 0, 0, 1.5, 0, 0, claimed)
+
+
+def test_translate_placeholders():
+    assert sqlite_backend.translate("SELECT * FROM t WHERE a = %s AND b = %s") == "SELECT * FROM t WHERE a = ? AND b = ?"
+
+
+def test_translate_like_escape():
+    assert sqlite_backend.translate("SELECT * FROM t WHERE a LIKE %s") == "SELECT * FROM t WHERE a LIKE ? ESCAPE '\\'"
+
+
+def test_like_matches_escaped_wildcards(conn):
+    add_stock(conn, "50%_off", "Round", 1)
+    add_stock(conn, "500 off", "Round", 1)
+    rows = run(conn, "SELECT Frame FROM stocks WHERE Frame LIKE %s", ("50\\%\\_%",))
+    assert rows == [("50%_off",)]
+
+
+def test_types_round_trip(conn):
+    add_stock(conn, "Rayban", "Round", 2)
+    run(conn, PLACE_ORDER, order("B1", "U1"))
+    conn.commit()
+    row = run(conn, "SELECT order_date, total_amount FROM customers WHERE bill_no = %s", ("B1",))[0]
+    assert row == (date(2026, 10, 18), Decimal("1500.00"))
+
+
+def test_place_order_claims_stock(conn):
+    add_stock(conn, "Rayban", "Round", 2)
+    [(customer_id, stock_left)] = run(conn, PLACE_ORDER, order("B1", "U1"))
+    assert stock_left == 1
+    assert stock_count(conn, "Rayban", "Round") == 1
+    assert run(conn, "SELECT COUNT(*) FROM eye_prescriptions WHERE customer_id = %s", (customer_id,)) == [(2,)]
+    assert run(conn, "SELECT unique_no FROM spectacles_no WHERE customer_id = %s", (customer_id,)) == [("U1",)]
+
+
+def test_place_order_out_of_stock(conn):
+    add_stock(conn, "Rayban", "Round", 0)
+    with pytest.raises(sqlite_backend.IntegrityError, match="Out of stock"):
+        run(conn, PLACE_ORDER, order("B1", "U1"))
+    assert stock_count(conn, "Rayban", "Round") == 0
+    assert run(conn, "SELECT COUNT(*) FROM customers") == [(0,)]
+
+
+def test_place_order_rollback_returns_stock(conn):
+    add_stock(conn, "Rayban", "Round", 3)
+    run(conn, PLACE_ORDER, order("B1", "U1"))
+    with pytest.raises(sqlite_backend.IntegrityError):
+        run(conn, PLACE_ORDER, order("B2", "U1"))     # spectacles number already used
+    assert stock_count(conn, "Rayban", "Round") == 2
+    assert run(conn, "SELECT bill_no FROM customers") == [("B1",)]
+    assert run(conn, "SELECT COUNT(*) FROM eye_prescriptions") == [(2,)]
+
+
+def test_place_order_already_claimed(conn):
+    add_stock(conn, "Rayban", "Round", 2)
+    [(_, stock_left)] = run(conn, PLACE_ORDER, order("B1", "U1", claimed=True))
+    assert stock_left == 2
+    with pytest.raises(sqlite_backend.IntegrityError):
+        run(conn, PLACE_ORDER, order("B2", "U1", claimed=True))
+    assert stock_count(conn, "Rayban", "Round") == 2     # the caller gives its own claim back
+
+
+def test_place_order_bill_already_saved(conn):
+    add_stock(conn, "Rayban", "Round", 3)
+    [(customer_id, _)] = run(conn, PLACE_ORDER, order("B1", "U1"))
+    assert run(conn, PLACE_ORDER, order("B1", "U1")) == [(customer_id, 2)]
+    with pytest.raises(sqlite_backend.IntegrityError, match="already used"):
+        run(conn, PLACE_ORDER, order("B1", "U2"))
+    assert stock_count(conn, "Rayban", "Round") == 2
+    assert run(conn, "SELECT COUNT(*) FROM customers") == [(1,)]
+
+
+def test_new_database_is_current(conn):
+    assert run(conn, "PRAGMA user_version") == [(sqlite_backend.SCHEMA_VERSION,)]
+
+
+def test_migration_from_version_1(tmp_path):
+    path = str(tmp_path / "old.db")
+    raw = sqlite3.connect(path)
+    with open(SCHEMA, encoding="utf-8") as f:
+        raw.executescript(f.read())
+    # What version 1 had on top of today's schema
+    raw.executescript("""
+        CREATE TRIGGER update_stock_after_order AFTER INSERT ON customers FOR EACH ROW
+        BEGIN
+            UPDATE stocks SET Count = Count - 1 WHERE Frame = NEW.Frame AND Type = NEW.Type;
+        END;
+        CREATE TABLE change_log (topic varchar(20) NOT NULL PRIMARY KEY, version bigint NOT NULL DEFAULT 0);
+        CREATE TRIGGER stocks_changed_after_insert AFTER INSERT ON stocks FOR EACH ROW
+        BEGIN
+            UPDATE change_log SET version = version + 1 WHERE topic = 'stocks';
+        END;
+        INSERT INTO stocks (Frame, Type, Count, Date) VALUES ('Rayban', 'Round', 5, '2026-10-18');
+        PRAGMA user_version = 1;
+    """)
+    raw.close()
+
+    conn = sqlite_backend.connect(path, SCHEMA)
+    try:
+        assert run(conn, "PRAGMA user_version") == [(sqlite_backend.SCHEMA_VERSION,)]
+        names = {name for (name,) in run(conn, "SELECT name FROM sqlite_master")}
+        assert not names & {"update_stock_after_order", "change_log", "stocks_changed_after_insert"}
+        run(conn, PLACE_ORDER, order("B1", "U1"))
+        assert stock_count(conn, "Rayban", "Round") == 4     # claimed once, not twice
+    finally:
+        conn.close()
@@ -1,4 +1,17 @@
 import bcrypt
 
+BCRYPT_ROUNDS = 12        # cost factor for new hashes; tune to the counter PCs
+REHASH_ON_LOGIN = True    # re-hash stored passwords with BCRYPT_ROUNDS on successful login
+
 def verify_password(input_password, hashed_password):
     return bcrypt.checkpw(input_password.encode(), hashed_password.encode())
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def needs_rehash(hashed_password, rounds=BCRYPT_ROUNDS):
+    # bcrypt hashes look like $2b$12$<salt+hash>; the second field is the cost
+    try:
+        return int(hashed_password.split('$')[2]) != rounds
+    except (IndexError, ValueError):
+        return False
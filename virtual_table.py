@@ -0,0 +1,266 @@
+from tkinter import ttk
+
+from repository import repo
+
+
+class KeysetQuery:
+    # A SELECT paged by keyset: rows are ordered by (sort column, key columns) and each page
+    # continues strictly after the last row already shown, so no OFFSET scan is needed.
+    # `select` is "SELECT ... FROM ..." producing the display columns followed by any hidden
+    # key columns; `key` and `sortable` hold (sql expression, row index) pairs. Rows come
+    # back as `record` instances when one is given and are timed under `name`.
+    def __init__(self, select, key, sortable, where="", params=(), name="keyset", record=None):
+        self.select = select
+        self.key = key
+        self.sortable = sortable
+        self.where = where
+        self.params = tuple(params)
+        self.name = name
+        self.record = record
+
+    def order_columns(self, sort):
+        columns = [self.sortable[sort]] if sort in self.sortable else []
+        return columns + [k for k in self.key if k not in columns]
+
+    def sort_key(self, row, sort):
+        return tuple(row[i] for _, i in self.order_columns(sort))
+
+    def page(self, limit, sort=None, descending=False, after=None, backwards=False):
+        columns = self.order_columns(sort)
+        reverse = descending != backwards
+        clauses = [f"({self.where})"] if self.where else []
+        params = list(self.params)
+        if after is not None:
+            # (c1, c2, ...) > (v1, v2, ...) spelled out so each branch can use an index
+            op = "<" if reverse else ">"
+            branches = []
+            for n, (expr, _) in enumerate(columns):
+                parts = [f"{e} = %s" for e, _ in columns[:n]] + [f"{expr} {op} %s"]
+                branches.append("(" + " AND ".join(parts) + ")")
+                params.extend(after[:n + 1])
+            clauses.append("(" + " OR ".join(branches) + ")")
+
+        sql = self.select
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        direction = "DESC" if reverse else "ASC"
+        sql += " ORDER BY " + ", ".join(f"{expr} {direction}" for expr, _ in columns) + " LIMIT %s"
+        params.append(limit)
+        return sql, params
+
+
+def collation_key(key):
+    # Text compared the way the database's case-insensitive collation orders it, so a row
+    # patched in locally lands where the next keyset page expects it
+    return tuple(v.casefold() if isinstance(v, str) else v for v in key)
+
+
+def fetch_page(query, limit, sort, descending, after, backwards):
+    sql, params = query.page(limit, sort, descending, after, backwards)
+    # Only a handful of distinct statements exist per query (sort column x direction x
+    # first page or not), so each one is prepared once per connection and reused
+    rows = repo.query_sql(query.name, sql, params, query.record)
+    if backwards:
+        rows.reverse()
+    return rows
+
+
+class VirtualTable(ttk.Frame):
+    # Treeview that only materializes a sliding window of rows. Further pages are fetched
+    # as the user scrolls towards either edge and rows falling out of the window are dropped.
+    # Clicking a sortable heading re-sorts in SQL.
+    def __init__(self, parent, columns, query=None, executor=None, page_size=50, window=200,
+                 height=10, width=100, anchor="w", on_error=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.query = query
+        self.executor = executor
+        self.page_size = page_size
+        self.window = max(window, page_size * 2)
+        self.on_error = on_error
+        self.sort = None
+        self.descending = False
+        self._generation = 0
+        self._job_key = f"virtual-table-{id(self)}"
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height)
+        for col in columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=width, anchor=anchor)
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.vsb.pack(side="right", fill="y")
+        self.tree.pack(fill="both", expand=True)
+        self._reset()
+
+    def _reset(self):
+        self.tree.delete(*self.tree.get_children())
+        self._iids = []        # loaded items, in display order
+        self._keys = []        # sort key of each loaded item, parallel to _iids
+        self._rows = {}        # iid -> full row
+        self.at_start = True   # nothing was dropped or left unfetched above the window
+        self.at_end = False
+        self._loading = False
+
+    # --- Treeview passthroughs used by the dashboards ---
+    def selection(self):
+        return self.tree.selection()
+
+    def item(self, iid, option=None, **kw):
+        return self.tree.item(iid, option, **kw)
+
+    def row(self, iid):
+        # Full row (record) behind a loaded item, hidden key columns included
+        return self._rows.get(iid)
+
+    def set_query(self, query):
+        self.query = query
+        self.reload()
+
+    def reload(self):
+        self._generation += 1
+        if self.executor is not None:
+            self.executor.cancel(self._job_key)
+        self._reset()
+        if self.query is None:
+            self.at_end = True
+        else:
+            self._load()
+
+    def sort_by(self, col):
+        if self.query is None or col not in self.query.sortable:
+            return
+        self.descending = not self.descending if self.sort == col else False
+        self.sort = col
+        for c in self.columns:
+            arrow = (" ▼" if self.descending else " ▲") if c == col else ""
+            self.tree.heading(c, text=c + arrow)
+        self.reload()
+
+    def _load(self, backwards=False):
+        if self._loading or self.query is None or (self.at_start if backwards else self.at_end):
+            return
+        after = None
+        if self._keys:
+            after = self._keys[0] if backwards else self._keys[-1]
+        self._loading = True
+        generation = self._generation
+        args = (self.query, self.page_size, self.sort, self.descending, after, backwards)
+        if self.executor is None:
+            try:
+                rows = fetch_page(*args)
+            except Exception as e:
+                self._failed(e)
+                return
+            self._loaded(generation, backwards, rows)
+        else:
+            self.executor.submit(fetch_page, *args, key=self._job_key, errback=self._failed,
+                                 callback=lambda rows: self._loaded(generation, backwards, rows))
+
+    def _failed(self, e):
+        self._loading = False
+        if self.on_error:
+            self.on_error(e)
+        else:
+            print(f"Error loading rows: {e}")
+
+    def _loaded(self, generation, backwards, rows):
+        if generation != self._generation:
+            return
+        self._loading = False
+        complete = len(rows) < self.page_size
+        # A row upserted while the page was in flight may be in it as well; keep the upserted copy
+        rows = [row for row in rows if self._iid(row) not in self._rows]
+        top = self._top_index()
+        if backwards:
+            self.at_start = complete
+            for row in reversed(rows):
+                self._insert(0, row)
+            dropped = self._trim(from_top=False)
+            self._restore_view(top + len(rows))
+        else:
+            self.at_end = complete
+            for row in rows:
+                self._insert(len(self._iids), row)
+            dropped = self._trim(from_top=True)
+            if dropped:
+                self._restore_view(top - dropped)
+
+    def _iid(self, row):
+        return "|".join(str(row[i]) for _, i in self.query.key)
+
+    def _insert(self, index, row):
+        iid = self._iid(row)
+        self.tree.insert("", index, iid=iid, values=row[:len(self.columns)])
+        self._iids.insert(index, iid)
+        self._keys.insert(index, self.query.sort_key(row, self.sort))
+        self._rows[iid] = row
+
+    def _delete(self, index):
+        iid = self._iids.pop(index)
+        del self._keys[index]
+        del self._rows[iid]
+        self.tree.delete(iid)
+
+    def _trim(self, from_top):
+        excess = len(self._iids) - self.window
+        if excess <= 0:
+            return 0
+        for _ in range(excess):
+            self._delete(0 if from_top else -1)
+        if from_top:
+            self.at_start = False
+        else:
+            self.at_end = False
+        return excess
+
+    def _top_index(self):
+        return round(self.tree.yview()[0] * len(self._iids)) if self._iids else 0
+
+    def _restore_view(self, top):
+        # Keep the rows the user was looking at in place when items are added or dropped above them
+        if self._iids:
+            self.tree.yview_moveto(max(top, 0) / len(self._iids))
+
+    def _on_scroll(self, first, last):
+        self.vsb.set(first, last)
+        if self._loading:
+            return
+        if float(last) >= 0.9 and not self.at_end:
+            self.after_idle(self._load)
+        elif float(first) <= 0.1 and not self.at_start:
+            self.after_idle(lambda: self._load(backwards=True))
+
+    # --- In-place patching for callers that track changes themselves ---
+    def upsert(self, row):
+        iid = self._iid(row)
+        key = self.query.sort_key(row, self.sort)
+        if iid in self._rows:
+            index = self._iids.index(iid)
+            if self._keys[index] == key:
+                if self._rows[iid] != row:
+                    self._rows[iid] = row
+                    self.tree.item(iid, values=row[:len(self.columns)])
+                return
+            self._delete(index)
+
+        # The window is small, so a linear scan for the insert position is cheap
+        index = len(self._keys)
+        key = collation_key(key)
+        for i, k in enumerate(map(collation_key, self._keys)):
+            if (k < key) if self.descending else (k > key):
+                index = i
+                break
+        # Rows that sort outside the loaded window are picked up when scrolled to
+        if (index == 0 and not self.at_start) or (index == len(self._keys) and not self.at_end):
+            return
+        top = self._top_index()
+        self._insert(index, row)
+        # A full window drops a row from the end farther from the view
+        from_top = top > len(self._iids) - top
+        if self._trim(from_top) and from_top:
+            self._restore_view(top - 1 if index > top else top)
+
+    def remove(self, iid):
+        if iid in self._rows:
+            self._delete(self._iids.index(iid))